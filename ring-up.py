@@ -1,4 +1,8 @@
-from ringup_bsolis19.application import Application
+from ringup_bsolis19.lib.timing import startup, start_startup_profile
+
+start_startup_profile()
+with startup.phase('imports'):
+    from ringup_bsolis19.application import Application
 
 app = Application()
 app.mainloop()
@@ -5,31 +5,35 @@ import tkinter as tk
 from . import views as v
 from . import models as m
 from . import settings as s
+from .lib.timing import finish_startup, startup
 from .mainmenu import get_main_menu_for_os
 
 
 class Application(tk.Tk):
 
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        with startup.phase('tk'):
+            super().__init__(*args, **kwargs)
 
-        self.title(s.APP_NAME)
-        self.geometry('%sx%s' % (s.WINDOW_WIDTH, s.WINDOW_HEIGHT))
+            self.title(s.APP_NAME)
+            self.geometry('%sx%s' % (s.WINDOW_WIDTH, s.WINDOW_HEIGHT))
 
         # data model
-        self.data_model = m.Product(
-                '1001',
-                '12r',
-                'Dozen Roses',
-                29.99,
-                color='red',
-                origin='Mexico'
-            )
+        with startup.phase('model'):
+            self.data_model = m.Product(
+                    '1001',
+                    '12r',
+                    'Dozen Roses',
+                    29.99,
+                    color='red',
+                    origin='Mexico'
+                )
 
         # settings model & settings
-        config_dir = s.CONFIG_DIR or '~'
-        self.settings_model = m.SettingsModel(path=config_dir)
-        self.load_settings()
+        with startup.phase('settings'):
+            config_dir = s.CONFIG_DIR or '~'
+            self.settings_model = m.SettingsModel(path=config_dir)
+            self.load_settings()
 
         self.callbacks = {
                 'file->select': self.on_file_select,
@@ -41,22 +45,34 @@ class Application(tk.Tk):
             }
 
         # menu
-        menu_class = get_main_menu_for_os(s.SYSTEM)
-        menu = menu_class(self, self.settings, self.callbacks)
-        self.config(menu=menu)
-
-        # templates
-        _ = tk.Frame(self, width=200, height=400, background='black')
-        _.pack(side=tk.LEFT, fill=tk.Y)
-
-        # product data form
-        self.productform = v.ProductForm(
-                self,
-                self.data_model,
-                self.settings,
-                self.callbacks,
-            )
-        self.productform.pack(side=tk.TOP, fill=tk.Y)
+        with startup.phase('menu'):
+            menu_class = get_main_menu_for_os(s.SYSTEM)
+            menu = menu_class(self, self.settings, self.callbacks)
+            self.config(menu=menu)
+
+        with startup.phase('views'):
+            # templates
+            _ = tk.Frame(self, width=200, height=400, background='black')
+            _.pack(side=tk.LEFT, fill=tk.Y)
+
+            # product data form
+            self.productform = v.ProductForm(
+                    self,
+                    self.data_model,
+                    self.settings,
+                    self.callbacks,
+                )
+            self.productform.pack(side=tk.TOP, fill=tk.Y)
+
+        # product list, built when first shown
+        self.catalog = None
+        self.productlist = None
+
+        self.after_idle(self._on_started)
+
+    def _on_started(self):
+        startup.mark('window ready')
+        finish_startup()
 
     def save_settings(self, *args):
         """Save current settings to file."""
@@ -90,9 +106,33 @@ class Application(tk.Tk):
         pass
 
     def show_productlist(self):
-        """Show the productform."""
-
-        self.productform.tkraise()
+        """Show the product list window."""
+
+        if self.productlist is None or not self.productlist.winfo_exists():
+            window = tk.Toplevel(self)
+            window.title('Products')
+            self.productlist = v.ProductList(
+                    window,
+                    self.get_catalog(),
+                    self.callbacks,
+                )
+            self.productlist.pack(fill=tk.BOTH, expand=True)
+        else:
+            self.productlist.load()
+        self.productlist.winfo_toplevel().lift()
+
+    def get_catalog(self):
+        """Return the catalog snapshot at CATALOG_PATH, or a new catalog."""
+
+        if self.catalog is None:
+            if s.CATALOG_PATH:
+                from .snapshot import CatalogSnapshot
+                self.catalog = CatalogSnapshot(s.CATALOG_PATH)
+            else:
+                from .product import ProductCatalog
+                self.catalog = ProductCatalog()
+                self.catalog.add(self.data_model)
+        return self.catalog
 
     def open_product(self):
         pass
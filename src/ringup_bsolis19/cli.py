@@ -0,0 +1,229 @@
+"""Headless batch pricing for ringup_bsolis19.
+
+Reads products and their addons from CSV or JSON Lines and writes one
+priced row per product, streaming both sides so memory use stays flat
+however large the feed is. Rows have sku, name and cost fields and
+optionally description, fixed_cost, waste and type; type 'addon' adds
+the row as an addon of the closest product above it. Any other field
+becomes a custom attribute.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import sys
+
+from .product import DEFAULT_MARGIN, ProductManager
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'jsonl')
+NUMERIC_FIELDS = ('cost', 'fixed_cost', 'waste')
+OUTPUT_FIELDS = ('sku', 'name', 'total_cost', 'price', 'profit')
+
+
+class RowError(ValueError):
+    """An input row that cannot be priced."""
+
+    def __init__(self, number, error):
+        super().__init__("row {0}: {1}".format(number, error))
+        self.number = number
+
+
+def read_rows(fh, format_):
+    """
+    Yield (row number, dict) for every row of fh.
+
+    Rows are numbered from 1 in both formats, counting data rows only:
+    a CSV header and blank lines are not rows.
+    """
+    if format_ == 'csv':
+        for number, row in enumerate(csv.DictReader(fh), start=1):
+            yield number, {
+                    k: v for k, v in row.items() if v not in ('', None)
+                }
+    else:
+        lines = (text for text in fh if text.strip())
+        for number, text in enumerate(lines, start=1):
+            row = json.loads(text)
+            if not isinstance(row, dict):
+                raise RowError(number, 'expected a JSON object')
+            yield number, row
+
+
+class BatchPricer:
+    """Builds products from rows and yields their prices once complete."""
+
+    def __init__(self, margin=DEFAULT_MARGIN, skip_invalid=False):
+        if not 0 <= margin < 1:
+            raise ValueError('margin must be at least 0 and less than 1')
+        self.margin = margin
+        self.skip_invalid = skip_invalid
+        self.manager = ProductManager()
+        self.skipped = 0
+        self._pending = False
+
+    def price(self, rows):
+        """Yield an output dict for every product in rows."""
+        skipping = False
+        for number, row in rows:
+            is_addon = row.pop('type', 'product') == 'addon'
+            if not is_addon:
+                if self._pending:
+                    yield self._output()
+                self._pending = skipping = False
+            elif skipping:
+                # the rest of a product that failed to build
+                self.skipped += 1
+                continue
+            elif not self._pending:
+                self._fail(number, 'addon without a product')
+                skipping = True
+                continue
+            try:
+                self._build(row, is_addon)
+            except (KeyError, TypeError, ValueError) as error:
+                self._fail(number, error)
+                self._pending = False
+                skipping = True
+            else:
+                self._pending = True
+        if self._pending:
+            yield self._output()
+            self._pending = False
+
+    def _build(self, row, is_addon):
+        fields = dict(row)
+        for field in NUMERIC_FIELDS:
+            if field in fields:
+                fields[field] = float(fields[field])
+        args = (str(fields.pop('sku')), fields.pop('name'), fields.pop('cost'))
+        if is_addon:
+            self.manager.create_addon(*args, **fields)
+        else:
+            self.manager.create_product(*args, **fields)
+
+    def _fail(self, number, error):
+        error = RowError(number, error)
+        if not self.skip_invalid:
+            raise error
+        self.skipped += 1
+        logger.warning("skipping %s", error)
+
+    def _output(self):
+        base = self.manager.product
+        product = self.manager.get_product()
+        return {
+                'sku': base.sku,
+                'name': base.name,
+                'total_cost': product.total_cost,
+                'price': product.calculate_price(self.margin),
+                'profit': product.calculate_profit(self.margin),
+            }
+
+
+def write_rows(fh, format_, rows):
+    if format_ == 'csv':
+        writer = csv.DictWriter(fh, OUTPUT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            fh.write(json.dumps(row))
+            fh.write('\n')
+
+
+def _guess_format(path, default='csv'):
+    for format_ in FORMATS:
+        if path.endswith('.' + format_):
+            return format_
+    return default
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+            prog='ringup-price',
+            description='Price products read from CSV or JSON Lines.',
+        )
+    parser.add_argument(
+            'input',
+            nargs='?',
+            default='-',
+            help="input file, '-' for stdin (default)",
+        )
+    parser.add_argument(
+            '-o', '--output',
+            default='-',
+            help="output file, '-' for stdout (default)",
+        )
+    parser.add_argument(
+            '-f', '--format',
+            choices=FORMATS,
+            help='input format, guessed from the file name (default csv)',
+        )
+    parser.add_argument(
+            '-t', '--output-format',
+            choices=FORMATS,
+            help='output format (default: the input format)',
+        )
+    parser.add_argument(
+            '-m', '--margin',
+            type=float,
+            default=DEFAULT_MARGIN,
+            help='profit margin (default %(default)s)',
+        )
+    parser.add_argument(
+            '--skip-invalid',
+            action='store_true',
+            help='log and skip rows that cannot be priced',
+        )
+    return parser
+
+
+def _open(path, mode, std):
+    if path == '-':
+        return std
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not 0 <= args.margin < 1:
+        parser.error('--margin must be at least 0 and less than 1')
+    in_format = args.format or _guess_format(args.input)
+    out_format = args.output_format or _guess_format(args.output, in_format)
+    pricer = BatchPricer(args.margin, args.skip_invalid)
+
+    try:
+        infile = _open(args.input, 'r', sys.stdin)
+    except OSError as error:
+        parser.error("cannot read {0}: {1}".format(args.input, error.strerror))
+    try:
+        outfile = _open(args.output, 'w', sys.stdout)
+    except OSError as error:
+        if infile is not sys.stdin:
+            infile.close()
+        parser.error(
+                "cannot write {0}: {1}".format(args.output, error.strerror)
+            )
+    try:
+        write_rows(
+                outfile,
+                out_format,
+                pricer.price(read_rows(infile, in_format)),
+            )
+    except (RowError, json.JSONDecodeError, csv.Error) as error:
+        sys.exit("ringup-price: error: {0}".format(error))
+    finally:
+        for fh in (infile, outfile):
+            if fh not in (sys.stdin, sys.stdout):
+                fh.close()
+    if pricer.skipped:
+        logger.warning("skipped %d invalid rows", pricer.skipped)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""Optional numpy support for batch pricing"""
+
+from array import array
+
+# numpy is slow to import, so it is loaded on first use; False records
+# that it is not installed.
+_numpy = None
+
+
+def load_numpy():
+    """Return the numpy module, or None when it is not installed."""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def round_cents(values):
+    """
+    Round values to cents exactly as round(value, 2) does.
+
+    With numpy, returns an array of the same shape; without it, values
+    is an iterable of numbers and an array.array('d') is returned.
+    """
+    numpy = load_numpy()
+    if numpy is None:
+        return array('d', (round(value, 2) for value in values))
+    values = numpy.asarray(values, dtype=float)
+    rounded = numpy.round(values, 2)
+    # numpy rounds value * 100, which can land on the other side of a
+    # half cent than the exact double does; round() decides those
+    scaled = values * 100
+    tie = numpy.abs(scaled - numpy.floor(scaled) - .5)
+    near = tie <= 4 * numpy.spacing(numpy.abs(scaled))
+    if near.any():
+        rounded[near] = [round(value, 2) for value in values[near].tolist()]
+    return rounded
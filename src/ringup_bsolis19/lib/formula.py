@@ -1,7 +1,19 @@
+import copy
+import functools
 import math
+import operator
+import os
+import threading
 import ply.lex as lex
 import ply.yacc as yacc
 
+from array import array
+from collections import namedtuple
+from collections.abc import Sized
+from types import MappingProxyType
+from .arrays import load_numpy
+
+
 tokens = (
         'NAME',
         'NUMBER_INT',
@@ -57,6 +69,11 @@ variables = {
         'e': math.e,
     }
 
+# name -> (callable, number of arguments)
+functions = {
+        'sin': (lambda x: math.sin(float(x)), 1),
+    }
+
 start = 'statement'
 
 
@@ -64,8 +81,7 @@ def p_statement_expression(t):
     '''
     statement : expression
     '''
-    global value
-    value = t[1]
+    t[0] = t[1]
 
 
 def p_expression_binop(t):
@@ -75,23 +91,14 @@ def p_expression_binop(t):
                | expression DIVIDE expression
                | expression TIMES expression
     '''
-    if t[2] == '+':
-        t[0] = t[1] + t[3]
-    elif t[2] == '-':
-        t[0] = t[1] - t[3]
-    elif t[2] == '*':
-        t[0] = t[1] * t[3]
-    elif t[2] == '/':
-        if t[3] == 0:
-            raise ValueError('division by zero invalid')
-        t[0] = t[1] / t[3]
+    t[0] = ('binop', t[2], t[1], t[3])
 
 
 def p_expression_uminus(t):
     '''
     expression : MINUS expression %prec UMINUS
     '''
-    t[0] = -t[2]
+    t[0] = ('negate', t[2])
 
 
 def p_expression_group(t):
@@ -107,26 +114,25 @@ def p_expressions(t):
                | expression
                |
     '''
-    if len(t) == 0:
-        t[0] = None
-        return
-    t[0] = [t[1]] if len(t) == 2 else t[1] + [t[3]]
+    if len(t) == 1:
+        t[0] = []
+    elif len(t) == 2:
+        t[0] = [t[1]]
+    else:
+        t[0] = [t[1], t[3]]
 
 
 def p_expression_function(t):
     '''
     expression : NAME LPAREN expressions RPAREN
     '''
-    if t[1] == 'sin':
-        if len(t[3]) == 1:
-            t[0] = math.sin(float(t[3][0]))
-            return
-        else:
-            # Handle missing/too many function arg
-            raise SyntaxError(SYNTAX_ERR_T % t[3])
-    else:
+    if t[1] not in functions:
         # Handle undefined function
         raise ValueError(VALUE_ERR_T % t[1])
+    if len(t[3]) != functions[t[1]][1]:
+        # Handle missing/too many function arg
+        raise SyntaxError(SYNTAX_ERR_T % t[3])
+    t[0] = ('call', t[1], tuple(t[3]))
 
 
 def p_expression_number(t):
@@ -134,14 +140,14 @@ def p_expression_number(t):
     expression : NUMBER_INT
                | NUMBER_DOUBLE
     '''
-    t[0] = t[1]
+    t[0] = ('number', t[1])
 
 
 def p_expression_name(t):
     '''
     expression : NAME
     '''
-    t[0] = variables[t[1]]
+    t[0] = ('name', t[1])
 
 
 def p_error(t):
@@ -149,9 +155,345 @@ def p_error(t):
     raise SyntaxError(SYNTAX_ERR_T % t[0])
 
 
-lexer = lex.lex()
-parser = yacc.yacc(debug=0, write_tables=0)
+# The LALR tables ship as formula_parsetab.py next to this module. They
+# are only read at runtime, as the installed package may be read-only and
+# shared by many processes; after a grammar change run
+#
+#     python -m ringup_bsolis19.lib.formula
+#
+# to regenerate them. Until then PLY rebuilds the tables in memory.
+TABMODULE = 'formula_parsetab'
+
+_lexer = None
+_parser = None
+_build_lock = threading.Lock()
+
+
+def _build():
+    global _lexer, _parser
+    with _build_lock:
+        if _parser is None:
+            _lexer = lex.lex()
+            _parser = yacc.yacc(
+                    debug=0,
+                    tabmodule=TABMODULE,
+                    write_tables=0,
+                )
+    return _lexer, _parser
+
+
+def write_parse_tables():
+    """Regenerate formula_parsetab.py if the grammar has changed."""
+    yacc.yacc(
+            debug=0,
+            tabmodule=TABMODULE,
+            outputdir=os.path.dirname(os.path.abspath(__file__)),
+            write_tables=1,
+        )
+
+
+def __getattr__(name):
+    # lexer and parser are only built the first time a formula is parsed
+    if name == 'lexer':
+        return _build()[0]
+    if name == 'parser':
+        return _build()[1]
+    raise AttributeError(
+            "module {0!r} has no attribute {1!r}".format(__name__, name)
+        )
+
+
+# PLY lexers and parsers keep their working state on the instance, so each
+# thread parses with its own copies; the tables themselves are shared.
+_local = threading.local()
+
+
+def _parse_tree(text):
+    try:
+        local_lexer, local_parser = _local.lexer, _local.parser
+    except AttributeError:
+        lexer, parser = _build()
+        local_lexer = _local.lexer = lexer.clone()
+        local_parser = _local.parser = copy.copy(parser)
+    return local_parser.parse(text, lexer=local_lexer)
+
+
+def _divide(a, b):
+    if b == 0:
+        raise ValueError('division by zero invalid')
+    return a / b
+
+
+binary_operators = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': _divide,
+    }
+
+
+def _compile_node(node, operators=None, calls=None):
+    """
+    Turn a syntax tree node into a closure taking a variables mapping.
+
+    operators and calls default to the scalar implementations; vector
+    evaluation passes their numpy counterparts.
+    """
+    if operators is None:
+        operators = binary_operators
+    if calls is None:
+        calls = {name: entry[0] for name, entry in functions.items()}
+    kind = node[0]
+    if kind == 'number':
+        number = node[1]
+        return lambda scope: number
+    if kind == 'name':
+        name = node[1]
+        if name in variables:
+            default = variables[name]
+            return lambda scope: scope.get(name, default)
+        return lambda scope: scope[name]
+    if kind == 'negate':
+        operand = _compile_node(node[1], operators, calls)
+        return lambda scope: -operand(scope)
+    if kind == 'binop':
+        op = operators[node[1]]
+        left = _compile_node(node[2], operators, calls)
+        right = _compile_node(node[3], operators, calls)
+        return lambda scope: op(left(scope), right(scope))
+    if kind == 'call':
+        function = calls[node[1]]
+        args = tuple(_compile_node(arg, operators, calls) for arg in node[2])
+        return lambda scope: function(*(arg(scope) for arg in args))
+    raise ValueError(VALUE_ERR_T % (node,))
+
+
+def _vector_divide(a, b):
+    numpy = load_numpy()
+    if numpy.any(numpy.equal(b, 0)):
+        raise ValueError('division by zero invalid')
+    return numpy.true_divide(a, b)
+
+
+vector_operators = {
+        '+': operator.add,
+        '-': operator.sub,
+        '*': operator.mul,
+        '/': _vector_divide,
+    }
+
+def _vector_sin(x):
+    numpy = load_numpy()
+    return numpy.sin(numpy.asarray(x, dtype=float))
+
+
+# name -> numpy counterpart, used when evaluating whole columns at once
+vector_functions = {
+        'sin': _vector_sin,
+    }
+
 
-# use value for debugging
-value = None
-parse = parser.parse
+def _is_column(value):
+    return isinstance(value, Sized) and not isinstance(value, str)
+
+
+def _column_size(columns):
+    sizes = set(len(value) for value in columns.values() if _is_column(value))
+    if len(sizes) != 1:
+        raise ValueError('expected one or more columns of equal length')
+    return sizes.pop()
+
+
+def _names(node):
+    """Yield every variable name referenced under node."""
+    kind = node[0]
+    if kind == 'name':
+        yield node[1]
+    elif kind == 'negate':
+        yield from _names(node[1])
+    elif kind == 'binop':
+        yield from _names(node[2])
+        yield from _names(node[3])
+    elif kind == 'call':
+        for arg in node[2]:
+            yield from _names(arg)
+
+
+_EMPTY_SCOPE = MappingProxyType({})
+
+
+def _tuple_getter(names):
+    """Return a function of a mapping returning its values for names."""
+    if len(names) > 1:
+        return operator.itemgetter(*names)
+    if names:
+        name, = names
+        return lambda scope: (scope[name],)
+    return lambda scope: ()
+
+
+class Formula:
+    """A formula parsed once and evaluable any number of times."""
+
+    def __init__(self, text, tree):
+        self.text = text
+        self.tree = tree
+        # the tree as a string, which caches its hash, so result caches
+        # don't walk the tree on every lookup
+        self.key = repr(tree)
+        hash(self.key)
+        self.names = frozenset(_names(tree))
+        self._sorted_names = tuple(sorted(self.names))
+        self._get_inputs = _tuple_getter(self._sorted_names)
+        self._evaluate = _compile_node(tree)
+        self._evaluate_vector = None
+
+    def evaluate(self, scope=None):
+        """
+        Evaluate against scope, a mapping of variable names to values.
+
+        Names missing from scope fall back to the module constants and
+        raise KeyError when neither defines them.
+        """
+        return self._evaluate(_EMPTY_SCOPE if scope is None else scope)
+
+    def inputs(self, scope=None):
+        """Return the values this formula reads from scope, sorted by name."""
+        scope = _EMPTY_SCOPE if scope is None else scope
+        try:
+            return self._get_inputs(scope)
+        except KeyError:
+            return tuple(
+                    scope[name] if name in scope else variables[name]
+                    for name in self._sorted_names
+                )
+
+    def evaluate_many(self, columns):
+        """
+        Evaluate once per row of columns.
+
+        columns maps variable names to equal-length sequences (lists,
+        array.array or numpy arrays); scalar values are shared by every
+        row. With numpy installed the whole batch is computed as array
+        operations and a numpy array is returned, otherwise the compiled
+        closure runs per row and an array.array of doubles is returned.
+        """
+        size = _column_size(columns)
+        numpy = load_numpy()
+        if numpy is None:
+            return self._evaluate_rows(columns)
+        if self._evaluate_vector is None:
+            self._evaluate_vector = _compile_node(
+                    self.tree,
+                    vector_operators,
+                    vector_functions,
+                )
+        scope = {
+                name: numpy.asarray(value, dtype=float)
+                if _is_column(value) else value
+                for name, value in columns.items()
+            }
+        result = self._evaluate_vector(scope)
+        return numpy.array(numpy.broadcast_to(result, (size,)), dtype=float)
+
+    def _evaluate_rows(self, columns):
+        row = {
+                name: value for name, value in columns.items()
+                if not _is_column(value)
+            }
+        names = [name for name in columns if name not in row]
+        result = array('d')
+        for values in zip(*(columns[name] for name in names)):
+            row.update(zip(names, values))
+            result.append(self._evaluate(row))
+        return result
+
+    __call__ = evaluate
+
+    def __repr__(self):
+        return "{0}({1!r})".format(self.__class__.__name__, self.text)
+
+
+# distinct formula texts kept compiled; the least recently used are
+# dropped first, so formulas from feeds and edits don't pile up
+COMPILE_CACHE_SIZE = 512
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile(text):
+    """Return the cached Formula for text, parsing it on first use."""
+    return Formula(text, _parse_tree(text))
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+
+class ResultCache:
+    """
+    A bounded LRU cache of formula results.
+
+    Results are keyed by the formula's syntax tree, so formulas differing
+    only in whitespace or grouping share entries, and by the values of
+    the variables it reads. One cache may be shared by many formulas.
+
+    A hit costs about as much as evaluating a formula of a few
+    operations, so the cache pays off for longer formulas.
+    """
+
+    def __init__(self, maxsize=1024):
+        if maxsize < 1:
+            raise ValueError('maxsize must be positive')
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # in least recently used order
+        self._results = dict()
+        self._lock = threading.Lock()
+
+    def evaluate(self, formula, scope=None):
+        """Return formula evaluated against scope, reusing a cached result."""
+        key = (formula.key, formula.inputs(scope))
+        results = self._results
+        with self._lock:
+            try:
+                # reinserting moves the key to the most recently used end
+                result = results[key] = results.pop(key)
+            except (KeyError, TypeError):
+                pass
+            else:
+                self.hits += 1
+                return result
+        result = formula.evaluate(scope)
+        with self._lock:
+            try:
+                results[key] = result
+            except TypeError:
+                # unhashable variable values are evaluated without caching
+                return result
+            self.misses += 1
+            if len(results) > self.maxsize:
+                del results[next(iter(results))]
+        return result
+
+    def cache_info(self):
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._results)
+
+
+def evaluate(text, scope=None):
+    """Return the value of text evaluated against scope."""
+    return compile(text).evaluate(scope)
+
+
+parse = evaluate
+
+
+if __name__ == '__main__':
+    write_parse_tables()
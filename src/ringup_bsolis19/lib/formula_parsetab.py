@@ -0,0 +1,44 @@
+
+# formula_parsetab.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'statementleftPLUSMINUSleftTIMESDIVIDErightUMINUSCOMMA DIVIDE LPAREN MINUS NAME NUMBER_DOUBLE NUMBER_INT PLUS RPAREN TIMES\n    statement : expression\n    \n    expression : expression PLUS expression\n               | expression MINUS expression\n               | expression DIVIDE expression\n               | expression TIMES expression\n    \n    expression : MINUS expression %prec UMINUS\n    \n    expression : LPAREN expression RPAREN\n    \n    expressions : expression COMMA expression\n               | expression\n               |\n    \n    expression : NAME LPAREN expressions RPAREN\n    \n    expression : NUMBER_INT\n               | NUMBER_DOUBLE\n    \n    expression : NAME\n    '
+    
+_lr_action_items = {'MINUS':([0,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,21,22,23,24,],[3,9,3,3,-14,-12,-13,3,3,3,3,-6,9,3,-2,-3,-4,-5,-7,9,-11,3,9,]),'LPAREN':([0,3,4,5,8,9,10,11,14,23,],[4,4,4,14,4,4,4,4,4,4,]),'NAME':([0,3,4,8,9,10,11,14,23,],[5,5,5,5,5,5,5,5,5,]),'NUMBER_INT':([0,3,4,8,9,10,11,14,23,],[6,6,6,6,6,6,6,6,6,]),'NUMBER_DOUBLE':([0,3,4,8,9,10,11,14,23,],[7,7,7,7,7,7,7,7,7,]),'$end':([1,2,5,6,7,12,15,16,17,18,19,22,],[0,-1,-14,-12,-13,-6,-2,-3,-4,-5,-7,-11,]),'PLUS':([2,5,6,7,12,13,15,16,17,18,19,21,22,24,],[8,-14,-12,-13,-6,8,-2,-3,-4,-5,-7,8,-11,8,]),'DIVIDE':([2,5,6,7,12,13,15,16,17,18,19,21,22,24,],[10,-14,-12,-13,-6,10,10,10,-4,-5,-7,10,-11,10,]),'TIMES':([2,5,6,7,12,13,15,16,17,18,19,21,22,24,],[11,-14,-12,-13,-6,11,11,11,-4,-5,-7,11,-11,11,]),'RPAREN':([5,6,7,12,13,14,15,16,17,18,19,20,21,22,24,],[-14,-12,-13,-6,19,-10,-2,-3,-4,-5,-7,22,-9,-11,-8,]),'COMMA':([5,6,7,12,15,16,17,18,19,21,22,],[-14,-12,-13,-6,-2,-3,-4,-5,-7,23,-11,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'statement':([0,],[1,]),'expression':([0,3,4,8,9,10,11,14,23,],[2,12,13,15,16,17,18,21,24,]),'expressions':([14,],[20,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> statement","S'",1,None,None,None),
+  ('statement -> expression','statement',1,'p_statement_expression','formula.py',78),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','formula.py',85),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','formula.py',86),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','formula.py',87),
+  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','formula.py',88),
+  ('expression -> MINUS expression','expression',2,'p_expression_uminus','formula.py',95),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','formula.py',102),
+  ('expressions -> expression COMMA expression','expressions',3,'p_expressions','formula.py',109),
+  ('expressions -> expression','expressions',1,'p_expressions','formula.py',110),
+  ('expressions -> <empty>','expressions',0,'p_expressions','formula.py',111),
+  ('expression -> NAME LPAREN expressions RPAREN','expression',4,'p_expression_function','formula.py',123),
+  ('expression -> NUMBER_INT','expression',1,'p_expression_number','formula.py',136),
+  ('expression -> NUMBER_DOUBLE','expression',1,'p_expression_number','formula.py',137),
+  ('expression -> NAME','expression',1,'p_expression_name','formula.py',144),
+]
@@ -1,10 +1,33 @@
 import logging
+import os
 import sys
 
+# LOG_LEVEL may name a level (DEBUG, INFO, ...) or give its number
+DEFAULT_LEVEL = 'WARNING'
+
+
+def get_level(level=None):
+    """Return the numeric level for level, LOG_LEVEL or DEFAULT_LEVEL."""
+    level = level or os.getenv('LOG_LEVEL') or DEFAULT_LEVEL
+    try:
+        return int(level)
+    except ValueError:
+        pass
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        raise ValueError("unknown log level: '%s'" % level)
+    return value
+
+
+def configure(level=None):
+    """Set the level of the root logger, see get_level()."""
+    logging.getLogger().setLevel(get_level(level))
+
+
 logging.basicConfig(
         format='[%(asctime)s]:%(levelname)s:%(name)s: %(message)s',
         stream=sys.stderr,
-        level=logging.DEBUG,
+        level=get_level(),
     )
 
 def logged(class_):
@@ -0,0 +1,169 @@
+"""Opt-in call counts and wall time for the pricing hot paths.
+
+enable() replaces the instrumented methods with timing wrappers and
+disable() puts the originals back, so while metrics are off the hot
+paths run exactly the code they always did. Times are inclusive: the
+time of a price includes the total cost it reads.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def default_targets():
+    """Return (owner, attribute, label) for every instrumented method."""
+    from .. import models as m
+    from .. import product
+    from . import formula
+
+    return [
+            (m.Product, 'calculate_price', None),
+            (m.Product, 'calculate_profit', None),
+            (m.Product, 'total_cost', None),
+            (m.CostFormula, 'get_cost', None),
+            (product.ProductManager, 'calculate_price', None),
+            (formula, '_parse_tree', 'formula.parse'),
+        ]
+
+
+class Metrics:
+    """
+    Counters for a set of methods, functions and properties.
+
+    Calls are counted under the class of the instance they were made
+    on, so a Product method inherited by Addon is reported separately
+    for each.
+    """
+
+    def __init__(self):
+        # label -> [calls, seconds]
+        self._stats = dict()
+        self._lock = threading.Lock()
+        # (owner, attribute, original) of everything patched by enable()
+        self._patched = list()
+        self._timer = None
+
+    @property
+    def enabled(self):
+        return bool(self._patched)
+
+    def enable(self, interval=None, targets=None):
+        """
+        Start counting calls to targets, default_targets() when None.
+
+        With interval, a snapshot is logged at INFO every interval
+        seconds from a daemon thread until disable().
+        """
+        if self.enabled:
+            return
+        for owner, name, label in targets or default_targets():
+            original = vars(owner)[name]
+            setattr(owner, name, self._wrap(owner, name, original, label))
+            self._patched.append((owner, name, original))
+        if interval:
+            with self._lock:
+                self._schedule(interval)
+
+    def disable(self):
+        """Restore the original methods and stop any periodic dump."""
+        with self._lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        while self._patched:
+            owner, name, original = self._patched.pop()
+            setattr(owner, name, original)
+
+    def _wrap(self, owner, name, original, label):
+        if isinstance(original, property):
+            return property(
+                    self._wrap(owner, name, original.fget, label),
+                    original.fset,
+                    original.fdel,
+                    original.__doc__,
+                )
+        if isinstance(owner, type):
+            return self._timed_method(original, name)
+        return self._timed(original, label or name)
+
+    def _timed(self, function, label):
+        record = self._record
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return timed
+
+    def _timed_method(self, function, name):
+        record = self._record
+
+        @functools.wraps(function)
+        def timed(instance, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(instance, *args, **kwargs)
+            finally:
+                record(
+                        (type(instance).__name__, name),
+                        time.perf_counter() - start,
+                    )
+        return timed
+
+    def _record(self, key, seconds):
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = [0, 0.0]
+            stat[0] += 1
+            stat[1] += seconds
+
+    def snapshot(self):
+        """Return {label: {'calls', 'total_ms', 'mean_us'}} so far."""
+        with self._lock:
+            stats = {
+                    key if isinstance(key, str) else '.'.join(key): tuple(stat)
+                    for key, stat in self._stats.items()
+                }
+        return {
+                label: {
+                    'calls': calls,
+                    'total_ms': seconds * 1000,
+                    'mean_us': seconds / calls * 1e6,
+                }
+                for label, (calls, seconds) in sorted(stats.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def dump(self):
+        logger.info("metrics %s", json.dumps(self.snapshot(), sort_keys=True))
+
+    def _schedule(self, interval):
+        # called holding the lock, so disable() cannot miss a new timer
+        self._timer = threading.Timer(interval, self._tick, (interval,))
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _tick(self, interval):
+        self.dump()
+        with self._lock:
+            if self._timer is not None:
+                self._schedule(interval)
+
+
+metrics = Metrics()
+
+enable = metrics.enable
+disable = metrics.disable
+snapshot = metrics.snapshot
+reset = metrics.reset
@@ -1,21 +1,139 @@
 """Utility classes for the observer pattern"""
+import threading
+import weakref
+
+from collections import OrderedDict
+
+# notifications deferred by batch(), per thread
+_local = threading.local()
+
+
+class _Batch:
+    def __enter__(self):
+        if getattr(_local, 'depth', 0) == 0:
+            _local.depth = 0
+            _local.pending = OrderedDict()
+        _local.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        if _local.depth > 1:
+            _local.depth -= 1
+            return
+        pending = _local.pending
+        try:
+            # updates made while flushing are coalesced into the same queue
+            while pending:
+                _, observer = pending.popitem(last=False)
+                observer.update_()
+        finally:
+            _local.depth = 0
+            _local.pending = None
+
+
+_batch = _Batch()
+
+
+def batch():
+    """
+    Return a context manager deferring observer updates in this thread.
+
+    Inside the outermost block each batchable observer is queued instead
+    of updated, once however many times it is notified, and is updated
+    when the block exits. Blocks nest.
+    """
+    return _batch
+
+
+def defer_update(observer):
+    """Update observer now, or once when the current batch exits."""
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        observer.update_()
+    else:
+        pending[id(observer)] = observer
+
+
+def _remover(registry):
+    # the callback holds the registry weakly so observers don't keep it alive
+    registry = weakref.ref(registry)
+
+    def remove(ref):
+        refs = registry()
+        if refs is not None and refs._refs.get(ref.key) is ref:
+            del refs._refs[ref.key]
+    return remove
+
+
+class ObserverRegistry:
+    """
+    Observers held by weak reference, in registration order.
+
+    Observers are keyed by identity, so adding and discarding are
+    constant time, and an observer is dropped once it is garbage
+    collected.
+    """
+
+    __slots__ = ('_refs', '_remove', '__weakref__')
+
+    def __init__(self, observers=()):
+        self._refs = dict()
+        self._remove = None
+        for observer in observers:
+            self.add(observer)
+
+    def add(self, observer):
+        if self._remove is None:
+            self._remove = _remover(self)
+        key = id(observer)
+        self._refs[key] = weakref.KeyedRef(observer, self._remove, key)
+
+    def discard(self, observer):
+        self._refs.pop(id(observer), None)
+
+    def __iter__(self):
+        # a copy, as observers may register or remove others while notified
+        for ref in list(self._refs.values()):
+            observer = ref()
+            if observer is not None:
+                yield observer
+
+    def __contains__(self, observer):
+        ref = self._refs.get(id(observer))
+        return ref is not None and ref() is observer
+
+    def __len__(self):
+        return len(self._refs)
+
+
 class ObservableMixin:
+    __slots__ = ()
+
     def __init__(self):
-        self._observers = list()
+        self._observers = ObserverRegistry()
 
     def _changed(self):
         self.notifyObservers()
 
     def registerObserver(self, observer):
-        self._observers.append(observer)
+        self._observers.add(observer)
 
     def removeObserver(self, observer):
-        self.remove(observer)
+        """Stop notifying observer; unregistered observers are ignored."""
+        self._observers.discard(observer)
 
     def notifyObservers(self):
         for observer in self._observers:
-            observer.update_()
+            if getattr(observer, 'batchable', True):
+                defer_update(observer)
+            else:
+                observer.update_()
 
 class ObserverMixin:
+    __slots__ = ()
+
+    # whether batch() may defer and coalesce this observer's updates
+    batchable = True
+
     def update_(self):
         self.load()
@@ -0,0 +1,227 @@
+"""Timelines of named phases in a run, such as application startup."""
+import time
+
+# the startup timeline counts from here, before the imports below
+_imported = time.perf_counter()
+
+import json
+import logging
+import os
+import platform
+import sys
+
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# set to a file name, or '-' for stderr, to write a startup report there
+PROFILE_ENV = 'RINGUP_PROFILE_STARTUP'
+PROFILE_FLAG = '--profile-startup'
+
+
+class Timeline:
+    """Phases and marks timed from when the timeline started."""
+
+    def __init__(self, name, start=None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        # (label, depth, start, end) in seconds since start, in start order
+        self.phases = list()
+        self._depth = 0
+
+    def _now(self):
+        return time.perf_counter() - self.start
+
+    def mark(self, label):
+        """Record label at the current time and return the time elapsed."""
+        elapsed = self._now()
+        self.phases.append((label, self._depth, elapsed, elapsed))
+        return elapsed
+
+    @contextmanager
+    def phase(self, label):
+        """Record the time spent in the block; phases may nest."""
+        index = len(self.phases)
+        # hold the phase's place so phases stay in start order
+        self.phases.append(None)
+        depth = self._depth
+        self._depth += 1
+        start = self._now()
+        try:
+            yield
+        finally:
+            self._depth = depth
+            self.phases[index] = (label, depth, start, self._now())
+
+    def _finished(self):
+        return [phase for phase in self.phases if phase is not None]
+
+    def report(self):
+        """Return a line per phase: its start, its duration and its label."""
+        lines = ["{0} timeline:".format(self.name)]
+        for label, depth, start, end in self._finished():
+            lines.append("{0:9.1f} ms {1:9.1f} ms  {2}{3}".format(
+                start * 1000,
+                (end - start) * 1000,
+                '  ' * depth,
+                label,
+                ))
+        return "\n".join(lines)
+
+    def log(self, level=logging.INFO):
+        if logger.isEnabledFor(level):
+            logger.log(level, "%s", self.report())
+
+    def as_dict(self):
+        phases = self._finished()
+        return {
+                'name': self.name,
+                'total_ms': max((end for *_, end in phases), default=0) * 1000,
+                'phases': [
+                    {
+                        'name': label,
+                        'depth': depth,
+                        'start_ms': start * 1000,
+                        'duration_ms': (end - start) * 1000,
+                    }
+                    for label, depth, start, end in phases
+                    ],
+            }
+
+
+class _TimedLoader:
+    # wraps a module's loader so executing the module is a timeline phase
+    def __init__(self, loader, timeline):
+        self._loader = loader
+        self._timeline = timeline
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._timeline.phase('import {0}'.format(module.__name__)):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class ImportTimer:
+    """
+    A meta path finder recording every module import as a phase.
+
+    Installed with start() and removed with stop(). A module's phase
+    includes the imports it makes, which appear as nested phases.
+    """
+
+    def __init__(self, timeline):
+        self.timeline = timeline
+
+    def start(self):
+        sys.meta_path.insert(0, self)
+
+    def stop(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, name, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimedLoader(spec.loader, self.timeline)
+        return spec
+
+
+def _package_version():
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        return None
+    try:
+        return version('ringup_bsolis19')
+    except PackageNotFoundError:
+        return None
+
+
+class StartupProfile:
+    """
+    A startup timeline with import timing, reported as JSON.
+
+    target is a file name, or '-' for stderr. The report adds the
+    package and Python versions and the platform to the timeline, so
+    reports from different releases and machines can be compared.
+    """
+
+    def __init__(self, timeline, target):
+        self.timeline = timeline
+        self.target = target
+        self.import_timer = ImportTimer(timeline)
+
+    def start(self):
+        self.import_timer.start()
+
+    def finish(self):
+        self.import_timer.stop()
+        report = dict(self.timeline.as_dict())
+        report.update({
+                'version': _package_version(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            })
+        text = json.dumps(report, indent=2)
+        if self.target == '-':
+            print(text, file=sys.stderr)
+        else:
+            with open(self.target, 'w', encoding='utf-8') as fh:
+                fh.write(text)
+                fh.write('\n')
+        return report
+
+
+def profile_target(argv=None, environ=None):
+    """
+    Return where the startup report goes, or None when not profiling.
+
+    --profile-startup[=FILE] on the command line wins over the
+    RINGUP_PROFILE_STARTUP environment variable; without a FILE the
+    report goes to stderr.
+    """
+    argv = sys.argv if argv is None else argv
+    environ = os.environ if environ is None else environ
+    for arg in argv[1:]:
+        if arg == PROFILE_FLAG:
+            return '-'
+        if arg.startswith(PROFILE_FLAG + '='):
+            return arg.split('=', 1)[1] or '-'
+    return environ.get(PROFILE_ENV) or None
+
+
+# started when this module is first imported, which the launcher does
+# before anything else
+startup = Timeline('startup', _imported)
+startup_profile = None
+
+
+def start_startup_profile(argv=None, environ=None):
+    """Begin profiling startup if asked to by argv or environ."""
+    global startup_profile
+    target = profile_target(argv, environ)
+    if target is not None and startup_profile is None:
+        startup_profile = StartupProfile(startup, target)
+        startup_profile.start()
+    return startup_profile
+
+
+def finish_startup():
+    """Log the startup timeline and write the profile, if one was started."""
+    global startup_profile
+    startup.log()
+    if startup_profile is not None:
+        profile, startup_profile = startup_profile, None
+        return profile.finish()
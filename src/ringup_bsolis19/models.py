@@ -2,17 +2,33 @@
 
 import os
 import json
-import re
-
-import ringup_bsolis19.lib.formula as fi
 
 from collections import OrderedDict
-from ringup_bsolis19.lib.observables import ObservableMixin, ObserverMixin
+from collections.abc import Mapping
+from logging import DEBUG
+from ringup_bsolis19.lib.observables import (
+        ObservableMixin,
+        ObserverMixin,
+        ObserverRegistry,
+        batch,
+    )
 from ringup_bsolis19.lib.log import logged
 
 
+def _compile_formula(text):
+    # the formula engine, and PLY with it, is imported with the first
+    # CostFormula rather than with the models
+    from ringup_bsolis19.lib import formula
+    return formula.compile(text)
+
+
 @logged
 class Product(ObservableMixin, ObserverMixin):
+    # bound on cached values, most of which are prices for distinct margins
+    CACHE_SIZE = 64
+    # updates only invalidate caches, which must not wait for a batch
+    batchable = False
+
     def __init__(
             self,
             id_,
@@ -26,83 +42,159 @@ class Product(ObservableMixin, ObserverMixin):
             **extras
             ):
         super().__init__()
-        self.name = name
-        self.id_ = str(id_)
-        self.sku = sku
-        self.cost = cost
-        self.description = description
-        self.fixed_cost = fixed_cost
-        self.waste = waste
-        self.is_template = is_template
+        # derived costs are cached until the base of the chain changes
+        self._base = self
+        self._version = 0
+        self._cache = dict()
+        self._cache_version = None
+        # own cost as last read, and the sum of it with the own costs of
+        # the addons down the product links from self
+        self._own = 0
+        self._addons_cost = 0
+        with batch():
+            self.name = name
+            self.id_ = str(id_)
+            self.sku = sku
+            self.cost = cost
+            self.description = description
+            self.fixed_cost = fixed_cost
+            self.waste = waste
+            self.is_template = is_template
 
         self._addons = OrderedDict()
         self._custom_attributes = dict(**extras)
-        self.logger.info(
-                "Initialized Product {name} ({id_})"
-                .format(
-                    name=self._name,
-                    id_=self.id_
-                )
-            )
+        self.logger.info("Initialized Product %s (%s)", self._name, self.id_)
 
     def update_(self):
         self._changed()
-        self.logger.debug("Updating observer {name}".format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Updating observer %s", self._name)
+
+    def _changed(self):
+        self._base._version += 1
+        super()._changed()
+
+    def _cached(self, key, compute, *args):
+        """Return compute(*args), reusing it until the chain changes."""
+        version = self._base._version
+        if self._cache_version != version:
+            # a new dict rather than clear(), so a computation started
+            # before the change in another thread stores into the old one
+            self._cache = dict()
+            self._cache_version = version
+        cache = self._cache
+        try:
+            return cache[key]
+        except KeyError:
+            pass
+        value = compute(*args)
+        if len(cache) >= self.CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+        return value
 
     def calculate_price(self, margin=.75):
-        self.logger.debug("Calculating price for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Calculating price for %s", self._name)
+        return self._cached(('price', margin), self._calculate_price, margin)
+
+    def _calculate_price(self, margin):
         return round((self.total_cost) / (1 - margin), 2)
 
     def calculate_profit(self, margin=.75):
-        self.logger.debug("Calculating profit for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Calculating profit for %s", self._name)
+        return self._cached(('profit', margin), self._calculate_profit, margin)
+
+    def _calculate_profit(self, margin):
         return round((self.calculate_price(margin) * margin), 2)
 
     @property
     def total_cost(self):
-        self.logger.debug("Calculating total cost for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Calculating total cost for %s", self._name)
+        return self._cached('total_cost', self._total_cost)
+
+    def _total_cost(self):
         if len(self.addons) > 0:
-            return list(self.addons.values())[-1].total_cost()
+            return next(reversed(self.addons.values())).total_cost
         return self.calculated_cost + self.fixed_cost
 
     @property
     def calculated_cost(self):
-        self.logger.debug("Calculating standard cost for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Calculating standard cost for %s", self._name)
+        return self._cached('calculated_cost', self._calculated_cost)
+
+    def _calculated_cost(self):
+        return self._own_cost()
+
+    def _own_cost(self):
         return self.cost * (1 + self.waste)
 
     @property
     def addons(self):
-        self.logger.debug("Getting addons for {name}".format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting addons for %s", self._name)
         return self._addons
 
     def get_addon(self, id_):
-        self.logger.debug("Getting addon with id {id_}".format(id_=id_))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting addon with id %s", id_)
         return self.addons.get(id_, None)
 
     def _register_addon(self, addon):
         self.logger.info(
-                "Registering addon {a_name} with product {p_name}"
-                .format(
-                    a_name=addon.name,
-                    p_name=self._name,
-                )
+                "Registering addon %s with product %s",
+                addon._name,
+                self._name,
             )
         self._addons[addon.id_] = addon
+        addon._own = addon._own_cost()
+        addon._addons_cost = addon._own + self._link(addon)._addons_cost
         self._changed()
         addon.registerObserver(self)
 
     def remove_addon(self, id_):
-        self.logger.info("Removing addon {id_}".format(id_=id_))
-        del self._addons[id_]
+        self.logger.info("Removing addon %s", id_)
+        ids = iter(self._addons)
+        for other in ids:
+            if other == id_:
+                break
+        following = next(ids, None)
+        self._addons.pop(id_).removeObserver(self)
+        if following is not None:
+            self._refresh_addons_cost(self._addons[following])
         self._changed()
 
+    def _link(self, addon):
+        """Return what addon builds on, skipping removed addons."""
+        product = addon.product
+        addons = self._addons
+        while product is not self and addons.get(product.id_) is not product:
+            product = product.product
+        return product
+
+    def _refresh_addons_cost(self, start):
+        """
+        Recompute the running addon costs from start to the last addon.
+
+        An addon is registered after what it builds on, so only start and
+        the addons after it can depend on start. Uses the own costs stored
+        at registration or at the last change, so no cost, and no
+        CostFormula, is read again.
+        """
+        refreshing = False
+        for addon in self._addons.values():
+            refreshing = refreshing or addon is start
+            if refreshing:
+                link = self._link(addon)
+                addon._addons_cost = addon._own + link._addons_cost
+
     @property
     def sku(self):
-        self.logger.debug("Getting sku for product {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting sku for product %s", self._name)
         return self._sku
 
     @sku.setter
@@ -114,17 +206,15 @@ class Product(ObservableMixin, ObserverMixin):
         else:
             raise TypeError('SKU must be a string')
         self.logger.info(
-                "Successfully set SKU to {sku} for {name}"
-                .format(
-                    sku=value,
-                    name=self._name,
-                )
-        )
+                "Successfully set SKU to %s for %s",
+                value,
+                self._name,
+            )
 
     @property
     def name(self):
-        self.logger.debug("Getting name for product {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting name for product %s", self._name)
         return self._name
 
     @name.setter
@@ -133,12 +223,12 @@ class Product(ObservableMixin, ObserverMixin):
             self._name = value.title()
         except AttributeError:
             raise TypeError
-        self.logger.info("Successfully set name to {name}".format(name=value))
+        self.logger.info("Successfully set name to %s", value)
 
     @property
     def cost(self):
-        self.logger.debug("Getting variable cost for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting variable cost for %s", self._name)
         # cost can be a CostFormula instance
         try:
             return self._cost.get_cost()
@@ -148,20 +238,24 @@ class Product(ObservableMixin, ObserverMixin):
     @cost.setter
     def cost(self, value):
         self._validate_cost(value)
+        previous = getattr(self, '_cost', None)
+        if isinstance(previous, ObservableMixin):
+            previous.removeObserver(self)
         self._cost = value
+        if isinstance(value, ObservableMixin):
+            # a CostFormula notifies us when its formula or variables change
+            value.registerObserver(self)
         self.logger.info(
-                "Successfully set variable cost to {cost} for {name}"
-                .format(
-                    cost=value,
-                    name=self._name
-                )
+                "Successfully set variable cost to %s for %s",
+                value,
+                self._name,
             )
         self._changed()
 
     @property
     def fixed_cost(self):
-        self.logger.debug("Getting fixed cost for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting fixed cost for %s", self._name)
         return self._fixed_cost
 
     @fixed_cost.setter
@@ -169,17 +263,16 @@ class Product(ObservableMixin, ObserverMixin):
         self._validate_cost(value)
         self._fixed_cost = value
         self.logger.info(
-                "Successfully set fixed cost to {cost} for {name}"
-                .format(
-                    cost=value,
-                    name=self._name,
-                )
+                "Successfully set fixed cost to %s for %s",
+                value,
+                self._name,
             )
         self._changed()
 
     @property
     def waste(self):
-        self.logger.debug("Getting waste for {name}".format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting waste for %s", self._name)
         return self._waste
 
     @waste.setter
@@ -187,11 +280,9 @@ class Product(ObservableMixin, ObserverMixin):
         self._validate_waste(value)
         self._waste = float(abs(value))
         self.logger.info(
-                "Successfully set waste to {waste} for {name}"
-                .format(
-                    waste=value,
-                    name=self._name,
-                )
+                "Successfully set waste to %s for %s",
+                value,
+                self._name,
             )
         self._changed()
 
@@ -201,8 +292,8 @@ class Product(ObservableMixin, ObserverMixin):
 
     @property
     def is_template(self):
-        self.logger.debug("Getting is_template for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting is_template for %s", self._name)
         return self._is_template
 
     @is_template.setter
@@ -210,33 +301,31 @@ class Product(ObservableMixin, ObserverMixin):
         if not isinstance(value, bool):
             raise TypeError("is_template must be a Boolean type")
         self._is_template = value
-        self.logger.info("Successfully set is_template to {0}".format(value))
+        self.logger.info("Successfully set is_template to %s", value)
 
     @property
     def custom_attributes(self):
-        self.logger.debug("Getting custom attributes for {name}"
-                          .format(name=self._name))
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug("Getting custom attributes for %s", self._name)
         return self._custom_attributes
 
     def set_custom_attribute(self, name, value):
         self._custom_attributes[name] = value
         self.logger.info(
-                "Successfully set custom attribute {name}: {value} for {name_}"
-                .format(
-                    name=name,
-                    value=value,
-                    name_=self.name
-                )
+                "Successfully set custom attribute %s: %s for %s",
+                name,
+                value,
+                self._name,
             )
         self._changed()
 
     def get_custom_attribute(self, name):
-        self.logger.debug("Getting custom attribute {name} for {name_}"
-                          .format(
-                              name=name,
-                              name_=self.name
-                            )
-                          )
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug(
+                    "Getting custom attribute %s for %s",
+                    name,
+                    self._name,
+                )
         return self._custom_attributes[name]
 
     def _validate_cost(self, cost):
@@ -261,7 +350,9 @@ class Product(ObservableMixin, ObserverMixin):
 
     __hash__ = None
 
-    price = property(calculate_price)
+    @property
+    def price(self):
+        return self.calculate_price()
 
 
 @logged
@@ -269,22 +360,24 @@ class Addon(Product):
     def __init__(self, product, *args, **extras):
         self.product = product
         super().__init__(*args, **extras)
+        self._base = product._base
+        self._cache_version = None
         self._register_addon(self)
 
     @property
     def addons(self):
-        return self.product.addons
+        return self._base.addons
 
     def get_addon(self, id_):
         if self.id_ == id_:
             return self
-        return self.product.get_addon(id_)
+        return self._base.get_addon(id_)
 
     def _register_addon(self, addon):
-        self.product._register_addon(addon)
+        self._base._register_addon(addon)
 
     def remove_addon(self, id_):
-        self.product.remove_addon(id_)
+        self._base.remove_addon(id_)
         if self.product.id_ == id_:
             self.product = self.product.product
         elif self.id_ == id_:
@@ -292,17 +385,23 @@ class Addon(Product):
                     "Cannot remove head object from chain of references"
                 )
 
-    @property
-    def calculated_cost(self):
-        return super().calculated_cost + self.product.calculated_cost
+    def _changed(self):
+        base = self._base
+        if base is not self and base._addons.get(self.id_) is self:
+            # only this addon's cost is read again
+            self._own = self._own_cost()
+            base._refresh_addons_cost(self)
+        super()._changed()
 
-    @property
-    def total_cost(self):
-        return self.calculated_cost + self.product.fixed_cost
+    def _calculated_cost(self):
+        return self._addons_cost + self._base.calculated_cost
+
+    def _total_cost(self):
+        return self.calculated_cost + self._base.fixed_cost
 
     @property
     def fixed_cost(self):
-        return self.product.fixed_cost
+        return self._base.fixed_cost
 
     @fixed_cost.setter
     def fixed_cost(self, value):
@@ -310,15 +409,133 @@ class Addon(Product):
             raise ValueError("Addon.fixed_cost must be zero")
         self._fixed_cost = value
 
-    # override inherited method
     def update_(self):
-        pass
+        # only a CostFormula cost notifies an addon
+        self._changed()
 
 
 class ProductProxy(Addon):
     pass
 
 
+class ProductRecord(ObservableMixin):
+    """
+    A compact, read-mostly product for large catalogs.
+
+    Keeps only the numbers Product prices from, in slots: a formula cost
+    is stored as its current value and the addon chain is folded into
+    addons_cost. Custom attributes and observers are only allocated when
+    first used.
+    """
+
+    __slots__ = (
+            'id_',
+            'sku',
+            'name',
+            'cost',
+            'fixed_cost',
+            'waste',
+            'addons_cost',
+            '_custom_attributes',
+            '_observers',
+        )
+
+    def __init__(
+            self,
+            id_,
+            sku,
+            name,
+            cost,
+            fixed_cost=0,
+            waste=0.0,
+            addons_cost=0,
+            **extras
+            ):
+        self.id_ = str(id_)
+        self.sku = sku
+        self.name = name
+        self.cost = cost
+        self.fixed_cost = fixed_cost
+        self.waste = waste
+        self.addons_cost = addons_cost
+        self._custom_attributes = dict(**extras) if extras else None
+        self._observers = None
+
+    @classmethod
+    def from_product(cls, product):
+        """Return a record pricing the same as product and its addons."""
+        base = product._base
+        if product is base and len(base.addons) > 0:
+            product = next(reversed(base.addons.values()))
+        record = cls(
+                base.id_,
+                base.sku,
+                base.name,
+                base.cost,
+                base.fixed_cost,
+                base.waste,
+                product._addons_cost,
+            )
+        if base.custom_attributes:
+            record._custom_attributes = dict(base.custom_attributes)
+        return record
+
+    def calculate_price(self, margin=.75):
+        return round((self.total_cost) / (1 - margin), 2)
+
+    def calculate_profit(self, margin=.75):
+        return round((self.calculate_price(margin) * margin), 2)
+
+    @property
+    def total_cost(self):
+        return self.calculated_cost + self.fixed_cost
+
+    @property
+    def calculated_cost(self):
+        return self.cost * (1 + self.waste) + self.addons_cost
+
+    @property
+    def price(self):
+        return self.calculate_price()
+
+    @property
+    def custom_attributes(self):
+        if self._custom_attributes is None:
+            self._custom_attributes = dict()
+        return self._custom_attributes
+
+    def set_custom_attribute(self, name, value):
+        self.custom_attributes[name] = value
+        self._changed()
+
+    def get_custom_attribute(self, name):
+        if self._custom_attributes is None:
+            raise KeyError(name)
+        return self._custom_attributes[name]
+
+    def registerObserver(self, observer):
+        if self._observers is None:
+            self._observers = ObserverRegistry()
+        super().registerObserver(observer)
+
+    def notifyObservers(self):
+        if self._observers is not None:
+            super().notifyObservers()
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return "{0}({1})".format(
+                self.__class__.__name__,
+                ", ".join(
+                    "{0}={1!r}".format(slot, getattr(self, slot))
+                    for slot in self.__slots__
+                    if not slot.startswith('_')
+                    )
+                )
+
+
 class SettingsModel:
     """A model for saving settings"""
 
@@ -371,17 +588,28 @@ class SettingsModel:
 
 
 @logged
-class CostFormula:
-    def __init__(self, formula, variables):
+class CostFormula(ObservableMixin):
+    """
+    A cost computed from a formula and its variables.
+
+    Observers are notified when formula or variables is assigned; after
+    changing the variables dict in place, reassign it to notify them.
+    """
+
+    # lib.formula.ResultCache used when none is passed to __init__
+    default_cache = None
+
+    def __init__(self, formula, variables, cache=None):
+        super().__init__()
         self.variables = variables
         self.formula = formula
+        self.cache = CostFormula.default_cache if cache is None else cache
 
-        self.logger.debug("[init] formula {0}, variables {1}"
-                          .format(
-                              formula,
-                              variables,
-                            )
-                          )
+        self.logger.debug(
+                "[init] formula %s, variables %s",
+                formula,
+                variables,
+            )
 
     @property
     def formula(self):
@@ -389,30 +617,51 @@ class CostFormula:
 
     @formula.setter
     def formula(self, value):
-        self._validate_formula(CostFormula._get_hard(value, self.variables))
+        if not isinstance(value, str):
+            raise TypeError('formula must be a string')
+        compiled = _compile_formula(value)
+        self._validate_formula(compiled)
+        self._compiled = compiled
         self._formula = value
+        self._changed()
+
+    @property
+    def variables(self):
+        return self._variables
+
+    @variables.setter
+    def variables(self, value):
+        self._variables = value
+        self._changed()
 
     def get_cost(self):
-        hard = CostFormula._get_hard(self.formula, self.variables)
-        fi.parse(hard)
-        self.logger.debug("[get_cost] parsed {0} ({1}) -> {2}"
-                          .format(
-                              self.formula,
-                              hard,
-                              fi.value,
-                            )
-                          )
-        return fi.value
-
-    @staticmethod
-    def _get_hard(formula, variables):
-        s = formula
-        for x in variables:
-            s = re.sub(x, str(variables[x]), s)
-        return s
-
-    def _validate_formula(self, str_):
-        fi.parse(str_)
+        if self.cache is None:
+            cost = self._compiled.evaluate(self.variables)
+        else:
+            cost = self.cache.evaluate(self._compiled, self.variables)
+        if self.logger.isEnabledFor(DEBUG):
+            self.logger.debug(
+                    "[get_cost] evaluated %s -> %s",
+                    self._formula,
+                    cost,
+                )
+        return cost
+
+    def get_costs(self, columns):
+        """
+        Return the cost for every row of columns in one batch.
+
+        columns maps variable names to equal-length sequences; variables
+        not given as columns keep their current value.
+        """
+        scope = dict(self.variables)
+        scope.update(columns)
+        return self._compiled.evaluate_many(scope)
+
+    def _validate_formula(self, compiled):
+        if not isinstance(self.variables, Mapping):
+            raise TypeError('variables must be a mapping')
+        compiled.evaluate(self.variables)
 
     def __lt__(self, other):
         return self.get_cost() < other
@@ -0,0 +1,185 @@
+"""Batch pricing of many products at many margins."""
+
+import itertools
+import os
+
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from .lib.arrays import load_numpy, round_cents
+from .product import CatalogMixin
+from .snapshot import CatalogSnapshot
+
+# one block of a streamed sweep: ids of the products in the block and
+# their price and profit rows, one column per margin
+SweepChunk = namedtuple('SweepChunk', ('ids', 'prices', 'profits'))
+
+
+def margin_range(start, stop, step):
+    """Return margins from start up to, but excluding, stop."""
+    count = int(round((stop - start) / step))
+    return [round(start + i * step, 10) for i in range(max(count, 0))]
+
+
+class MarginSweep:
+    """
+    Prices and profits of a set of products at every margin in a list.
+
+    Each product's total_cost is read once; prices for all margins are
+    then computed together, as one numpy operation when numpy is
+    installed. Rounding matches Product.calculate_price and
+    calculate_profit, with or without numpy.
+    """
+
+    def __init__(self, margins):
+        self.margins = array('d', margins)
+        if len(self.margins) == 0:
+            raise ValueError('expected at least one margin')
+        if any(margin >= 1 for margin in self.margins):
+            raise ValueError('margins must be less than 1')
+
+    def matrix(self, products):
+        """
+        Return (prices, profits) with a row per product, column per margin.
+
+        products is a ProductCatalog, a CatalogSnapshot or an iterable of
+        products; rows are numpy arrays, or lists of array.array without
+        numpy.
+        """
+        if isinstance(products, CatalogMixin):
+            totals = products.total_costs()
+        else:
+            totals = array('d', (product.total_cost for product in products))
+        return self._price(totals)
+
+    def stream(self, products, chunk_size=10000):
+        """
+        Yield a SweepChunk for every chunk_size products.
+
+        Only one chunk of totals and results is held at a time, so
+        catalogs larger than a full price matrix can be swept.
+        """
+        if isinstance(products, CatalogMixin):
+            totals = products.total_costs()
+            for start in range(0, len(products), chunk_size):
+                stop = start + chunk_size
+                yield SweepChunk(
+                        products.ids[start:stop],
+                        *self._price(totals[start:stop])
+                    )
+            return
+        products = iter(products)
+        while True:
+            chunk = list(itertools.islice(products, chunk_size))
+            if not chunk:
+                return
+            totals = array('d', (product.total_cost for product in chunk))
+            yield SweepChunk(
+                    [product.id_ for product in chunk],
+                    *self._price(totals)
+                )
+
+    def _price(self, totals):
+        numpy = load_numpy()
+        if numpy is None:
+            prices = [
+                    round_cents(
+                        total / (1 - margin) for margin in self.margins
+                        )
+                    for total in totals
+                ]
+            profits = [
+                    round_cents(
+                        price * margin
+                        for price, margin in zip(row, self.margins)
+                        )
+                    for row in prices
+                ]
+            return prices, profits
+        margins = numpy.array(self.margins, dtype=float)
+        totals = numpy.asarray(totals, dtype=float)
+        prices = round_cents(totals[:, None] / (1 - margins))
+        profits = round_cents(prices * margins)
+        return prices, profits
+
+
+# the snapshot a worker process reads rows from, opened as it starts
+_snapshot = None
+
+
+def _init_worker(snapshot):
+    global _snapshot
+    _snapshot = snapshot
+
+
+def _sweep_rows(margins, start, stop):
+    return SweepChunk(
+            _snapshot.ids[start:stop],
+            *MarginSweep(margins)._price(_snapshot.total_costs(start, stop))
+        )
+
+
+class ParallelRepricer:
+    """
+    A MarginSweep of a CatalogSnapshot sharded across worker processes.
+
+    Each worker opens the snapshot once and is sent only the start and
+    stop of its rows, chunk_size at a time, so totals and prices are
+    all computed in the workers. Formula costs were evaluated when the
+    catalog was built; to reprice products, add them to a
+    ProductCatalog and write a snapshot of it first.
+
+    Results come back in row order, with at most two chunks per worker
+    in flight at a time.
+    """
+
+    def __init__(self, margins, workers=None, chunk_size=1000):
+        self.sweep = MarginSweep(margins)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def _jobs(self, snapshot):
+        """Yield (function, *args) to submit for every chunk of rows."""
+        margins = list(self.sweep.margins)
+        for start in range(0, len(snapshot), self.chunk_size):
+            yield _sweep_rows, margins, start, start + self.chunk_size
+
+    def stream(self, snapshot):
+        """Yield a SweepChunk per chunk of snapshot rows, in row order."""
+        if not isinstance(snapshot, CatalogSnapshot):
+            raise TypeError('ParallelRepricer prices a CatalogSnapshot')
+        return self._stream(snapshot)
+
+    def _stream(self, snapshot):
+        jobs = self._jobs(snapshot)
+        pending = deque()
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(snapshot,),
+                ) as pool:
+            while True:
+                room = self.workers * 2 - len(pending)
+                for job in itertools.islice(jobs, room):
+                    pending.append(pool.submit(*job))
+                if not pending:
+                    return
+                yield pending.popleft().result()
+
+    def matrix(self, snapshot):
+        """Return (prices, profits) for snapshot, as MarginSweep.matrix."""
+        chunks = list(self.stream(snapshot))
+        numpy = load_numpy()
+        if numpy is None:
+            return (
+                    [row for chunk in chunks for row in chunk.prices],
+                    [row for chunk in chunks for row in chunk.profits],
+                )
+        width = len(self.sweep.margins)
+        if not chunks:
+            return numpy.empty((0, width)), numpy.empty((0, width))
+        return (
+                numpy.concatenate([chunk.prices for chunk in chunks]),
+                numpy.concatenate([chunk.profits for chunk in chunks]),
+            )
@@ -1,6 +1,9 @@
 import uuid
 
+from array import array
+
 from . import models as m
+from .lib.arrays import load_numpy, round_cents
 
 DEFAULT_MARGIN = .75
 
@@ -24,10 +27,45 @@ class ProductManager:
 
     product_builder = ProductBuilder
 
-    def __init__(self):
+    def __init__(self, store=None):
+        # a storage.SQLiteProductStore, used by save() and open_product()
+        self.store = store
         self.product = ProductManager.product_builder.build_blank_product()
         self.complete_product = self.product
 
+    @property
+    def complete_product(self):
+        # addons of an opened product are loaded when first needed
+        if self._unloaded is not None:
+            product, self._unloaded = self._unloaded, None
+            self._complete_product = self.store.load_addons(product)
+        return self._complete_product
+
+    @complete_product.setter
+    def complete_product(self, value):
+        self._unloaded = None
+        self._complete_product = value
+
+    def open_product(self, id_):
+        return self._open(self._get_store().load(id_))
+
+    def open_product_by_sku(self, sku):
+        return self._open(self._get_store().load_by_sku(sku))
+
+    def _open(self, product):
+        self.product = self.complete_product = product
+        self._unloaded = product
+        return self
+
+    def save(self):
+        self._get_store().save(self.complete_product)
+        return self
+
+    def _get_store(self):
+        if self.store is None:
+            raise ValueError('ProductManager has no store')
+        return self.store
+
     def create_product(self, sku, name, cost, **extras):
         self.product = ProductManager.product_builder\
                 .build_product(
@@ -43,7 +81,7 @@ class ProductManager:
     def create_addon(self, sku, name, cost, **extras):
         self.complete_product = ProductManager.product_builder\
                 .build_addon(
-                        self.product,
+                        self.complete_product,
                         self._gen_id(),
                         sku,
                         name,
@@ -59,17 +97,17 @@ class ProductManager:
         return self.complete_product.calculate_price(margin)
 
     def get_addons(self):
-        return self.product.addons
+        return self.complete_product.addons
 
     def get_addon(self, id_=''):
         if id_:
-            return self.product.get_addon(id_)
+            return self.complete_product.get_addon(id_)
         if len(self.complete_product.addons) != 0:
             return self.complete_product
 
 
     def remove_addon(self, id_):
-        if self.product.addons.get(id_, None) is None:
+        if self.get_addons().get(id_, None) is None:
             return self
 
         if self.complete_product.id_ is id_:
@@ -80,3 +118,120 @@ class ProductManager:
 
     def _gen_id(self):
         return str(uuid.uuid4())
+
+
+class CatalogMixin:
+    """
+    Row access and bulk pricing over ids, skus, names and columns.
+
+    columns maps each name in COLUMNS to a sequence of doubles that
+    exports a buffer, such as array.array('d').
+    """
+
+    COLUMNS = ('cost', 'fixed_cost', 'waste', 'addons_cost')
+
+    def get_record(self, row):
+        return m.ProductRecord(
+                self.ids[row],
+                self.skus[row],
+                self.names[row],
+                *(self.columns[name][row] for name in CatalogMixin.COLUMNS)
+            )
+
+    __getitem__ = get_record
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.get_record(row)
+
+    def total_costs(self, start=0, stop=None):
+        """Return the total cost of rows start to stop, in row order."""
+        numpy = load_numpy()
+        columns = [self.columns[name] for name in CatalogMixin.COLUMNS]
+        if numpy is None:
+            return array('d', (
+                cost * (1 + waste) + addons_cost + fixed_cost
+                for cost, fixed_cost, waste, addons_cost in zip(*(
+                    column[start:stop] for column in columns
+                    ))
+                ))
+        # the views must not outlive this call: an array.array cannot
+        # grow while it exports its buffer
+        cost, fixed_cost, waste, addons_cost = (
+                numpy.frombuffer(column, dtype=float)[start:stop]
+                for column in columns
+            )
+        return cost * (1 + waste) + addons_cost + fixed_cost
+
+    def calculate_price(self, margin=DEFAULT_MARGIN):
+        """
+        Return the price of every row at margin, rounded to cents.
+
+        Prices are rounded as Product.calculate_price rounds them.
+        """
+        numpy = load_numpy()
+        if numpy is None:
+            return round_cents(
+                    total / (1 - margin) for total in self.total_costs()
+                )
+        return round_cents(self.total_costs() / (1 - margin))
+
+    def calculate_profit(self, margin=DEFAULT_MARGIN):
+        """Return the profit of every row at margin, rounded to cents."""
+        numpy = load_numpy()
+        prices = self.calculate_price(margin)
+        if numpy is None:
+            return round_cents(price * margin for price in prices)
+        return round_cents(prices * margin)
+
+
+class ProductCatalog(CatalogMixin):
+    """
+    Products stored as columns of numbers for pricing in bulk.
+
+    Each product is a row; its cost, fixed_cost, waste and folded addon
+    cost live in contiguous array.array('d') columns, so whole-catalog
+    prices are a few numpy operations when numpy is installed. New
+    products can be built through the catalog's ProductManager.
+    """
+
+    def __init__(self, manager=None):
+        self.manager = manager or ProductManager()
+        self.ids = list()
+        self.skus = list()
+        self.names = list()
+        self.columns = {name: array('d') for name in ProductCatalog.COLUMNS}
+        self._rows = dict()
+
+    def add(self, product):
+        """
+        Add a Product, addon chain or ProductRecord and return its row.
+
+        A product whose id_ is already catalogued replaces that row.
+        """
+        if not isinstance(product, m.ProductRecord):
+            product = m.ProductRecord.from_product(product)
+        row = self._rows.get(product.id_)
+        if row is None:
+            row = self._rows[product.id_] = len(self.ids)
+            self.ids.append(product.id_)
+            self.skus.append(product.sku)
+            self.names.append(product.name)
+            for name, column in self.columns.items():
+                column.append(getattr(product, name))
+        else:
+            self.skus[row] = product.sku
+            self.names[row] = product.name
+            for name, column in self.columns.items():
+                column[row] = getattr(product, name)
+        return row
+
+    def add_product(self):
+        """Add the manager's current product and its addons."""
+        return self.add(self.manager.get_product())
+
+    def row(self, id_):
+        return self._rows[str(id_)]
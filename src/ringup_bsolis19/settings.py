@@ -1,17 +1,36 @@
 from dotenv import load_dotenv
 from pathlib import Path
+
+from .lib.timing import startup
+
 # Get the base directory
 basepath = Path()
 basedir = str(basepath.cwd())
 # Load the environment variables
 envars = basepath.cwd() / '.env'
-load_dotenv(envars, verbose=True)
+with startup.phase('load .env'):
+    load_dotenv(envars, verbose=True)
 
 import os
 import platform
 
+from .lib.log import configure as configure_logging
+
 APP_NAME=os.getenv('APP_NAME')
 WINDOW_HEIGHT=os.getenv('WINDOW_HEIGHT')
 WINDOW_WIDTH=os.getenv('WINDOW_WIDTH')
 CONFIG_DIR=os.getenv('CONFIG_DIR')
 SYSTEM=platform.system()
+LOG_LEVEL=os.getenv('LOG_LEVEL')
+# optional catalog snapshot listed by show_productlist
+CATALOG_PATH=os.getenv('CATALOG_PATH')
+
+with startup.phase('configure logging'):
+    configure_logging(LOG_LEVEL)
+
+# set to collect pricing metrics: the seconds between dumps logged at
+# INFO, or 0 to collect without dumping
+METRICS_INTERVAL=os.getenv('METRICS_INTERVAL')
+if METRICS_INTERVAL:
+    from .lib import metrics
+    metrics.enable(float(METRICS_INTERVAL))
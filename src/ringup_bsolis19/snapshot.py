@@ -0,0 +1,194 @@
+"""Read-only binary snapshots of a ProductCatalog.
+
+A snapshot is one file laid out as:
+
+    header      magic (8 bytes), row count (uint64)
+    columns     cost, fixed_cost, waste, addons_cost: count doubles each
+    offsets     ids, skus, names: count + 1 uint64 each, relative to the
+                start of that string's blob
+    indexes     rows sorted by id and by sku: count uint64 each
+    blobs       UTF-8 ids, skus and names, back to back
+
+Numbers are in the byte order of the machine that wrote the file, which
+the magic records. Opening a snapshot maps the file and reads straight
+from the mapping, so nothing is deserialized up front and processes that
+open the same file share its pages.
+"""
+
+import mmap
+import os
+import struct
+import sys
+
+from array import array
+from collections.abc import Sequence
+
+from .product import CatalogMixin
+
+MAGIC = b'RUSNAP1' + (b'<' if sys.byteorder == 'little' else b'>')
+HEADER = struct.Struct('=8sQ')
+STRINGS = ('ids', 'skus', 'names')
+
+
+def _encoded(strings):
+    """Return (offsets, blob) for strings encoded as UTF-8."""
+    offsets = array('Q', [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode('utf-8')
+        offsets.append(len(blob))
+    return offsets, blob
+
+
+def write_snapshot(catalog, path):
+    """
+    Write catalog to a snapshot at path.
+
+    The file is written next to path and moved into place, so processes
+    that have the previous snapshot open keep reading it unchanged.
+    """
+    count = len(catalog)
+    encoded = [_encoded(getattr(catalog, name)) for name in STRINGS]
+    # rows sorted by their encoded id and sku; the sort is stable, so the
+    # first of several rows sharing a sku is found first
+    orders = [
+            array('Q', sorted(
+                range(count),
+                key=lambda row: bytes(blob[offsets[row]:offsets[row + 1]]),
+                ))
+            for offsets, blob in encoded[:2]
+        ]
+    temporary = '{0}.tmp'.format(path)
+    with open(temporary, 'wb') as fh:
+        fh.write(HEADER.pack(MAGIC, count))
+        for name in CatalogMixin.COLUMNS:
+            fh.write(array('d', catalog.columns[name]).tobytes())
+        for offsets, _ in encoded:
+            fh.write(offsets.tobytes())
+        for order in orders:
+            fh.write(order.tobytes())
+        for _, blob in encoded:
+            fh.write(blob)
+    os.replace(temporary, path)
+
+
+class StringColumn(Sequence):
+    """The strings of one snapshot field, decoded as they are read."""
+
+    def __init__(self, data, offsets, start):
+        self._data = data
+        self._offsets = offsets
+        self._start = start
+
+    def encoded(self, row):
+        start = self._start
+        return self._data[
+                start + self._offsets[row]:start + self._offsets[row + 1]
+            ]
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('row out of range')
+        return self.encoded(row).decode('utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+
+class CatalogSnapshot(CatalogMixin):
+    """
+    A ProductCatalog snapshot opened read-only through mmap.
+
+    Rows are read the way ProductCatalog's are, and id_ and sku lookups
+    binary search the sorted indexes in the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._views = list()
+        with open(path, 'rb') as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._map()
+        except ValueError:
+            self.close()
+            raise
+
+    def _map(self):
+        if len(self._mmap) < HEADER.size:
+            raise ValueError('{0} is not a catalog snapshot'.format(self.path))
+        magic, count = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError('{0} is not a catalog snapshot'.format(self.path))
+        view = memoryview(self._mmap)
+        self._views.append(view)
+        position = HEADER.size
+
+        def take(format_, length):
+            nonlocal position
+            size = struct.calcsize(format_) * length
+            if position + size > len(view):
+                raise ValueError('{0} is truncated'.format(self.path))
+            section = view[position:position + size].cast(format_)
+            self._views.append(section)
+            position += size
+            return section
+
+        self.columns = {
+                name: take('d', count) for name in CatalogMixin.COLUMNS
+            }
+        offsets = [take('Q', count + 1) for _ in STRINGS]
+        self._id_order = take('Q', count)
+        self._sku_order = take('Q', count)
+        for name, field_offsets in zip(STRINGS, offsets):
+            setattr(
+                    self,
+                    name,
+                    StringColumn(self._mmap, field_offsets, position),
+                )
+            position += field_offsets[count]
+        if position > len(view):
+            raise ValueError('{0} is truncated'.format(self.path))
+
+    def row(self, id_):
+        return self._find(self.ids, self._id_order, id_)
+
+    def row_by_sku(self, sku):
+        """Return the first row with sku."""
+        return self._find(self.skus, self._sku_order, sku)
+
+    def _find(self, strings, order, key):
+        encoded = str(key).encode('utf-8')
+        low, high = 0, len(order)
+        while low < high:
+            middle = (low + high) // 2
+            if strings.encoded(order[middle]) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(order) or strings.encoded(order[low]) != encoded:
+            raise KeyError(key)
+        return order[low]
+
+    def __getstate__(self):
+        # a snapshot travels to other processes as its path
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def close(self):
+        # the mapping cannot close while views of it are alive
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,266 @@
+"""SQLite storage for ringup_bsolis19 products."""
+
+import itertools
+import json
+import sqlite3
+import weakref
+
+from . import models as m
+from .lib.observables import batch
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    id_ TEXT PRIMARY KEY,
+    sku TEXT NOT NULL,
+    name TEXT NOT NULL,
+    cost REAL,
+    formula TEXT,
+    variables TEXT,
+    description TEXT NOT NULL DEFAULT '',
+    fixed_cost REAL NOT NULL DEFAULT 0,
+    waste REAL NOT NULL DEFAULT 0,
+    is_template INTEGER NOT NULL DEFAULT 0,
+    custom_attributes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS products_sku ON products (sku);
+CREATE TABLE IF NOT EXISTS addons (
+    id_ TEXT PRIMARY KEY,
+    base_id TEXT NOT NULL REFERENCES products (id_) ON DELETE CASCADE,
+    parent_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    sku TEXT NOT NULL,
+    name TEXT NOT NULL,
+    cost REAL,
+    formula TEXT,
+    variables TEXT,
+    description TEXT NOT NULL DEFAULT '',
+    waste REAL NOT NULL DEFAULT 0,
+    custom_attributes TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS addons_base ON addons (base_id, position);
+'''
+
+PRODUCT_COLUMNS = (
+        'id_', 'sku', 'name', 'cost', 'formula', 'variables', 'description',
+        'fixed_cost', 'waste', 'is_template', 'custom_attributes',
+    )
+ADDON_COLUMNS = (
+        'id_', 'base_id', 'parent_id', 'position', 'sku', 'name', 'cost',
+        'formula', 'variables', 'description', 'waste', 'custom_attributes',
+    )
+
+
+def _insert(table, columns):
+    # an upsert rather than INSERT OR REPLACE, which deletes the old row
+    # and with it, through the foreign key, a product's addons
+    return (
+            'INSERT INTO {0} ({1}) VALUES ({2})'
+            ' ON CONFLICT ({3}) DO UPDATE SET {4}'
+        ).format(
+            table,
+            ', '.join(columns),
+            ', '.join('?' * len(columns)),
+            columns[0],
+            ', '.join(
+                '{0} = excluded.{0}'.format(column) for column in columns[1:]
+                ),
+        )
+
+
+def _cost_fields(product):
+    """Return (cost, formula, variables) columns for product's own cost."""
+    cost = product._cost
+    if isinstance(cost, m.CostFormula):
+        return None, cost.formula, json.dumps(cost.variables)
+    return cost, None, None
+
+
+def _load_cost(row):
+    if row['formula'] is None:
+        return row['cost']
+    return m.CostFormula(row['formula'], json.loads(row['variables']))
+
+
+def _set_custom_attributes(product, row):
+    # set one by one, as their names may clash with constructor arguments
+    for name, value in json.loads(row['custom_attributes']).items():
+        product.set_custom_attribute(name, value)
+
+
+class SQLiteProductStore:
+    """
+    Products, their addon chains, cost formulas and custom attributes
+    in a SQLite file.
+
+    Products are looked up by id_ or sku through indexes, and a
+    product's addons are read separately with load_addons(), so opening
+    a product reads only its own rows. Saving a product whose addons
+    were never loaded keeps its saved addons, adding any new ones after
+    them.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        # products loaded without their addons, by identity
+        self._without_addons = weakref.WeakValueDictionary()
+
+    def save(self, product):
+        """Save product, or the base of an addon chain, with its addons."""
+        self.save_many((product,))
+
+    def save_many(self, products, batch_size=1000):
+        """Save products in transactions of batch_size products each."""
+        products = iter(products)
+        while True:
+            batch = [
+                    product._base
+                    for product in itertools.islice(products, batch_size)
+                ]
+            if not batch:
+                return
+            with self.connection:
+                self._write(batch)
+
+    def _write(self, bases):
+        self.connection.executemany(
+                'DELETE FROM addons WHERE base_id = ?',
+                (
+                    (base.id_,) for base in bases
+                    if not self._addons_unloaded(base)
+                    ),
+            )
+        self.connection.executemany(
+                _insert('products', PRODUCT_COLUMNS),
+                (self._product_row(base) for base in bases),
+            )
+        self.connection.executemany(
+                _insert('addons', ADDON_COLUMNS),
+                (row for base in bases for row in self._addon_rows(base)),
+            )
+
+    def _addons_unloaded(self, base):
+        return self._without_addons.get(id(base)) is base
+
+    def _next_position(self, base):
+        return self.connection.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM addons'
+                ' WHERE base_id = ?',
+                (base.id_,),
+            ).fetchone()[0]
+
+    def _product_row(self, product):
+        return (
+                product.id_,
+                product.sku,
+                product.name,
+                *_cost_fields(product),
+                product.description,
+                product.fixed_cost,
+                product.waste,
+                int(product.is_template),
+                json.dumps(product.custom_attributes),
+            )
+
+    def _addon_rows(self, base):
+        if not base.addons:
+            return
+        start = 0
+        if self._addons_unloaded(base):
+            # the saved addons stay; new ones are added after them
+            start = self._next_position(base)
+        for position, addon in enumerate(base.addons.values(), start):
+            parent = addon.product
+            # link past addons that have since been removed
+            while parent is not base and parent.id_ not in base.addons:
+                parent = parent.product
+            yield (
+                    addon.id_,
+                    base.id_,
+                    parent.id_,
+                    position,
+                    addon.sku,
+                    addon.name,
+                    *_cost_fields(addon),
+                    addon.description,
+                    addon.waste,
+                    json.dumps(addon.custom_attributes),
+                )
+
+    def load(self, id_):
+        """Return the product with id_, without its addons."""
+        return self._load_one('SELECT * FROM products WHERE id_ = ?', id_)
+
+    def load_by_sku(self, sku):
+        """Return the first product saved with sku, without its addons."""
+        return self._load_one(
+                'SELECT * FROM products WHERE sku = ? ORDER BY rowid LIMIT 1',
+                sku,
+            )
+
+    def _load_one(self, query, key):
+        row = self.connection.execute(query, (str(key),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        product = m.Product(
+                row['id_'],
+                row['sku'],
+                row['name'],
+                _load_cost(row),
+                row['description'],
+                row['fixed_cost'],
+                row['waste'],
+                bool(row['is_template']),
+            )
+        _set_custom_attributes(product, row)
+        self._without_addons[id(product)] = product
+        return product
+
+    def load_addons(self, product):
+        """Attach the saved addons of product and return the last one."""
+        self._without_addons.pop(id(product), None)
+        built = {product.id_: product}
+        complete = product
+        rows = self.connection.execute(
+                'SELECT * FROM addons WHERE base_id = ? ORDER BY position',
+                (product.id_,),
+            )
+        with batch():
+            for row in rows:
+                complete = built[row['id_']] = m.Addon(
+                        built.get(row['parent_id'], product),
+                        row['id_'],
+                        row['sku'],
+                        row['name'],
+                        _load_cost(row),
+                        row['description'],
+                        0,
+                        row['waste'],
+                    )
+                _set_custom_attributes(complete, row)
+        return complete
+
+    def delete(self, id_):
+        with self.connection:
+            self.connection.execute(
+                    'DELETE FROM products WHERE id_ = ?',
+                    (str(id_),),
+                )
+
+    def __len__(self):
+        return self.connection.execute(
+                'SELECT COUNT(*) FROM products'
+            ).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
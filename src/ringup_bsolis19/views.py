@@ -5,12 +5,15 @@ import tkinter as tk
 from tkinter import ttk
 
 from . import widgets as w
+from .lib.observables import batch, defer_update
 
 
 class Form(tk.Frame):
 
     PROFIT_COLOR = "#118C4F"
     FOCUS_COLOR = "#1D3F6E"
+    # edits made within this many milliseconds are applied together
+    UPDATE_DELAY_MS = 200
 
     def __init__(self, parent, model, settings, callbacks, *args, **kwargs):
         super().__init__(parent, *args, **kwargs)
@@ -18,6 +21,39 @@ class Form(tk.Frame):
         self.settings = settings
         self.callbacks = callbacks
         self.inputs = {}
+        self._edited = set()
+        self._update_id = None
+
+    def _bind_update(self, field):
+        """Apply edits of field to the model once typing pauses."""
+        for sequence in ('<KeyRelease>', '<FocusOut>'):
+            self.inputs[field].input_.bind(
+                    sequence,
+                    lambda event: self._schedule_update(field),
+                    add='+',
+                )
+
+    def _schedule_update(self, field):
+        self._edited.add(field)
+        if self._update_id is not None:
+            self.after_cancel(self._update_id)
+        self._update_id = self.after(self.UPDATE_DELAY_MS, self._apply_updates)
+
+    def _apply_updates(self):
+        self._update_id = None
+        fields, self._edited = self._edited, set()
+        # observers of the model are updated once, after every field is set
+        with batch():
+            for field in fields:
+                self._apply_update(field)
+
+    def _apply_update(self, field):
+        getattr(self, "_set_model_{}".format(field))()
+
+    def destroy(self):
+        if self._update_id is not None:
+            self.after_cancel(self._update_id)
+        super().destroy()
 
     def _build_layout(self):
         return tk.Frame(
@@ -36,16 +72,27 @@ class Form(tk.Frame):
 
     def _build_tabbed_component(self, parent, *tabs):
         component = ttk.Notebook(parent)
+        # tab contents are built the first time each tab is selected
+        unbuilt = dict()
         for tab in tabs:
-            component.add(
-                getattr(
-                    self,
-                    "_build_{}_frame".format(tab.lower())
-                    )(component),
-                text=tab.title(),
+            page = tk.Frame(component)
+            component.add(page, text=tab.title())
+            unbuilt[str(page)] = tab
+        component.bind(
+                '<<NotebookTabChanged>>',
+                lambda event: self._build_selected_tab(component, unbuilt),
             )
         return component
 
+    def _build_selected_tab(self, component, unbuilt):
+        tab = unbuilt.pop(component.select(), None)
+        if tab is not None:
+            page = component.nametowidget(component.select())
+            getattr(
+                self,
+                "_build_{}_frame".format(tab.lower())
+                )(page).pack(fill=tk.BOTH, expand=True)
+
     def _build_description_frame(self, parent):
         container = tk.Frame(parent)
         container.pack_propagate(False)
@@ -119,6 +166,7 @@ class ProductForm(Form):
 
         # Data
         self.header_var = tk.StringVar(value=self.model.name)
+        self.addons_view = None
 
         # Containers
         header_container = tk.Frame(self)
@@ -158,7 +206,7 @@ class ProductForm(Form):
             )
         self.inputs['cost'].grid(row=2, column=0)
         self.inputs['cost'].set(self.model.cost)
-        self.inputs['cost'].input_.bind('<FocusOut>', self._set_model_cost)
+        self._bind_update('cost')
 
         self.inputs['fixed_cost'] = w.LabelInput(
                 layout,
@@ -167,8 +215,7 @@ class ProductForm(Form):
             )
         self.inputs['fixed_cost'].grid(row=2, column=1)
         self.inputs['fixed_cost'].set(self.model.fixed_cost)
-        self.inputs['fixed_cost'].input_\
-            .bind('<FocusOut>', self._set_model_fixed_cost)
+        self._bind_update('fixed_cost')
 
         self.inputs['waste'] = w.LabelInput(
                 layout,
@@ -177,7 +224,7 @@ class ProductForm(Form):
             )
         self.inputs['waste'].grid(row=2, column=2)
         self.inputs['waste'].set(self.model.waste)
-        self.inputs['waste'].input_.bind('<FocusOut>', self._set_model_waste)
+        self._bind_update('waste')
 
         self.inputs['margin'] = w.LabelInput(
                 layout,
@@ -186,7 +233,7 @@ class ProductForm(Form):
                 input_args={'width': 3},
             )
         self.inputs['margin'].grid(row=2, column=2)
-        self.inputs['margin'].input_.bind('<FocusOut>', self._reload_output)
+        self._bind_update('margin')
 
         # tabbed sections
         tabs = self._build_tabbed_component(
@@ -209,9 +256,13 @@ class ProductForm(Form):
 
     def _build_addons_frame(self, parent):
         container = tk.Frame(parent)
-        group_container = tk.Listbox(container, font=('Calibri', 16))
-        self.load_addons(group_container)
-        group_container.pack()
+        self.addons_view = w.VirtualListView(
+                container,
+                self._get_addons,
+                model=self.model,
+                listbox_args={'font': ('Calibri', 16)},
+            )
+        self.addons_view.pack()
         btns_container = tk.Frame(container)
         self._build_control_buttons(
                 btns_container,
@@ -264,22 +315,21 @@ class ProductForm(Form):
         self.profit_output.grid(row=1, column=0)
         return container
 
-    def load_addons(self, parent):
-        addons = self._get_addons()
-        self._display_addons(parent, addons)
+    def load_addons(self):
+        if self.addons_view is not None:
+            self.addons_view.load()
 
     def _get_addons(self):
-        return self.model.addons
+        return tuple(self.model.addons.values())
 
-    def _display_addons(self, parent, addons):
-        i = 0
-        for addon in addons:
-            parent.insert(i, str(addon))
-            i += 1
+    def _set_model_margin(self, *args):
+        # the margin is not part of the model; the outputs read it and
+        # show an error instead of an amount while it is invalid
+        self._reload_output()
 
     def _reload_output(self, *args):
-        self.profit_output.load()
-        self.price_output.load()
+        for output in (self.profit_output, self.price_output):
+            defer_update(output)
 
     def _add_addon_cmd(self):
         print('addon clicked')
@@ -382,3 +432,33 @@ class AddonForm(Form):
         except ValueError:
             # TODO Handle invalid data
             pass
+
+
+class ProductList(tk.Frame):
+    """A scrolling list of the products in a catalog."""
+
+    def __init__(self, parent, catalog, callbacks, *args, **kwargs):
+        super().__init__(parent, *args, **kwargs)
+        self.catalog = catalog
+        self.callbacks = callbacks
+
+        header = tk.Label(self, text='Products', font=("Calibri", 24))
+        header.pack()
+        self.list_view = w.VirtualListView(
+                self,
+                self._get_products,
+                self._format_product,
+                height=20,
+                listbox_args={'font': ('Calibri', 16), 'width': 40},
+            )
+        self.list_view.pack(fill=tk.BOTH, expand=True)
+
+    def load(self):
+        self.list_view.load()
+
+    def _get_products(self):
+        return self.catalog
+
+    @staticmethod
+    def _format_product(record):
+        return '{0}  {1}'.format(record.sku, record.name)
@@ -6,6 +6,20 @@ from ringup_bsolis19.lib.observables import ObserverMixin
 
 DEFAULT_FONT = ("Calibri", 18)
 
+# outputs are computed off the Tk event loop, one at a time
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='ringup-output',
+            )
+    return _executor
+
 
 class LabelObserverOutput(tk.Label, ObserverMixin):
     def __init__(self, parent, model, output_data, label_args=None):
@@ -14,6 +28,10 @@ class LabelObserverOutput(tk.Label, ObserverMixin):
         self.model.registerObserver(self)
         self.get_output_data = output_data
 
+    def destroy(self):
+        self.model.removeObserver(self)
+        super().destroy()
+
     def load(self):
         # self.config(text=str(self.model.calculate_price(self.margin)))
         self.config(text=str(self.get_output_data(*self.output_args)))
@@ -24,18 +42,66 @@ class LabelObserverOutput(tk.Label, ObserverMixin):
 
 
 class MoneyOutput(LabelObserverOutput):
+    """
+    A label showing an amount computed in a background thread.
+
+    Each load() supersedes the last: a computation that has not started
+    is cancelled and a result that arrives after a newer load() is
+    discarded, so the label only ever shows the latest amount.
+    """
+
+    # how often the Tk event loop checks for a finished computation
+    POLL_MS = 20
+    # shown in place of an amount while the margin cannot be used
+    INVALID_MARGIN_TEXT = 'Invalid margin'
+
     def __init__(self, parent, model, amount, margin, label_args=None):
+        self._generation = 0
+        self._future = None
         super().__init__(parent, model, amount, label_args)
         self.margin = margin
         self.load()
 
+    def load(self):
+        self._supersede()
+        # Tk variables are read here, on the main thread
+        try:
+            args = self.output_args
+        except (tk.TclError, ValueError):
+            self.config(text=self.INVALID_MARGIN_TEXT)
+            return
+        self._future = _get_executor().submit(self.get_output_data, *args)
+        self.after(self.POLL_MS, self._poll, self._future, self._generation)
+
+    def _supersede(self):
+        self._generation += 1
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _poll(self, future, generation):
+        if generation != self._generation:
+            # superseded; the newer load() polls its own result
+            return
+        if not future.done():
+            self.after(self.POLL_MS, self._poll, future, generation)
+            return
+        self.config(text=str(future.result()))
+
+    def destroy(self):
+        self._supersede()
+        super().destroy()
+
     @property
     def output_args(self):
         return tuple([self.margin])
 
     @property
     def margin(self):
-        return float(self._margin.get())
+        margin = float(self._margin.get())
+        if not 0 <= margin < 1:
+            raise ValueError('margin must be at least 0 and less than 1')
+        return margin
 
     @margin.setter
     def margin(self, value):
@@ -64,11 +130,166 @@ class PriceOutput(MoneyOutput):
              )
 
 
+class VirtualListView(tk.Frame, ObserverMixin):
+    """
+    A scrolling list that only materializes the rows in view.
+
+    get_rows returns the sequence to show and format_row turns one of
+    its items into text. The listbox holds just `height` lines; scrolling
+    reformats the rows that come into view, so a list of 100k rows opens
+    and scrolls as fast as one of ten. When model is given the rows are
+    fetched again and redrawn each time it notifies its observers.
+    """
+
+    def __init__(
+            self,
+            parent,
+            get_rows,
+            format_row=str,
+            model=None,
+            height=10,
+            listbox_args=None,
+            **kwargs
+            ):
+        super().__init__(parent, **kwargs)
+        self.get_rows = get_rows
+        self.format_row = format_row
+        self.model = model
+        self.height = height
+        self.first = 0
+        self.selected = None
+        self.rows = get_rows()
+
+        self.listbox = tk.Listbox(
+                self,
+                height=height,
+                exportselection=False,
+                activestyle=tk.NONE,
+                **(listbox_args or {})
+            )
+        self.scrollbar = tk.Scrollbar(self, command=self._scroll)
+        self.listbox.grid(row=0, column=0, sticky=tk.NSEW)
+        self.scrollbar.grid(row=0, column=1, sticky=tk.NS)
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.listbox.bind('<<ListboxSelect>>', self._on_select)
+        self.listbox.bind('<MouseWheel>', self._on_mousewheel)
+        self.listbox.bind('<Button-4>', lambda event: self.scroll_by(-1))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll_by(1))
+        self.listbox.bind('<Up>', lambda event: self._step(-1))
+        self.listbox.bind('<Down>', lambda event: self._step(1))
+
+        if model is not None:
+            model.registerObserver(self)
+        self._draw()
+
+    def load(self):
+        self.rows = self.get_rows()
+        if self.selected is not None and self.selected >= len(self.rows):
+            self.selected = None
+        self.first = self._clamp(self.first)
+        self._draw()
+
+    def destroy(self):
+        if self.model is not None:
+            self.model.removeObserver(self)
+        super().destroy()
+
+    def selected_item(self):
+        if self.selected is None:
+            return None
+        return self.rows[self.selected]
+
+    def scroll_to(self, first):
+        first = self._clamp(first)
+        if first != self.first:
+            self.first = first
+            self._draw()
+
+    def scroll_by(self, count):
+        self.scroll_to(self.first + count)
+
+    def see(self, row):
+        if row < self.first:
+            self.scroll_to(row)
+        elif row >= self.first + self.height:
+            self.scroll_to(row - self.height + 1)
+
+    def _clamp(self, first):
+        return max(0, min(first, len(self.rows) - self.height))
+
+    def _draw(self):
+        rows = self.rows
+        total = len(rows)
+        last = min(self.first + self.height, total)
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(
+                0,
+                *(self.format_row(rows[row])
+                  for row in range(self.first, last))
+            )
+        if self.selected is not None and self.first <= self.selected < last:
+            self.listbox.selection_set(self.selected - self.first)
+        if total:
+            self.scrollbar.set(self.first / total, last / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _scroll(self, action, amount, unit=None):
+        # the scrollbar's command: ('moveto', fraction) or
+        # ('scroll', count, 'units' or 'pages')
+        if action == tk.MOVETO:
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        elif unit == tk.PAGES:
+            self.scroll_by(int(amount) * self.height)
+        else:
+            self.scroll_by(int(amount))
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120, macOS smaller deltas
+        delta = event.delta
+        if abs(delta) >= 120:
+            delta //= 120
+        self.scroll_by(-delta)
+
+    def _on_select(self, event):
+        selection = self.listbox.curselection()
+        if selection:
+            self.selected = self.first + selection[0]
+
+    def _step(self, count):
+        if not self.rows:
+            return 'break'
+        if self.selected is None:
+            self.selected = self.first
+        else:
+            self.selected = max(
+                    0,
+                    min(self.selected + count, len(self.rows) - 1),
+                )
+        self.see(self.selected)
+        self._draw()
+        self.listbox.event_generate('<<ListboxSelect>>')
+        return 'break'
+
+
 class DictView(tk.Frame):
+    """
+    Editable rows for the items of a dict.
+
+    Rows are indexed by key, so deleting one needs no search, and the
+    rows of deleted items are hidden and kept for reuse by the next
+    items added. Items can be added and removed in bulk; Tk lays out
+    the changed rows together when it next goes idle.
+    """
+
     def __init__(self, parent, data):
         super().__init__(parent)
         self.data = data
-        self.entries = list()
+        # key -> LabelInput of that key's row
+        self.entries = dict()
+        self._spare = list()
         self.new_entry = None
         self._build()
 
@@ -92,38 +313,51 @@ class DictView(tk.Frame):
 
     def _add_data(self, parent, data):
         for key, value in data.items():
-            container = tk.Frame(parent)
-            labelInput = LabelInput(
-                    container,
-                    key,
-                )
-            self._add_delete_btn(container, key).grid()
-            labelInput.grid(row=0, column=1)
+            labelInput = self.entries.get(key)
+            if labelInput is None:
+                labelInput = self.entries[key] = self._get_row(parent)
+                labelInput.label.config(text=key)
+                labelInput.master.pack()
             labelInput.set(value)
-            container.pack()
-            self.entries.append(labelInput)
 
-    def _add_delete_btn(self, parent, key):
+    def _get_row(self, parent):
+        if self._spare:
+            return self._spare.pop()
+        container = tk.Frame(parent)
+        labelInput = LabelInput(container)
+        self._add_delete_btn(container, labelInput).grid()
+        labelInput.grid(row=0, column=1)
+        return labelInput
+
+    def _add_delete_btn(self, parent, labelInput):
+        # the row's key is read when clicked, as rows are reused
         return tk.Button(
                 parent,
                 text="Delete",
-                command=lambda: self.delete_entry_cmd(key),
+                command=lambda: self.delete_entry_cmd(
+                    labelInput.label.cget('text')
+                    ),
             )
 
+    def add_entries(self, data):
+        """Add or update several items at once."""
+        self.data.update(data)
+        self._add_data(self, data)
+
+    def remove_entries(self, keys):
+        """Remove several items at once."""
+        for key in keys:
+            self._remove_entry(key)
+
     def delete_entry_cmd(self, key):
         self._remove_entry(key)
 
     def _remove_entry(self, key):
-        target = None
-        for labelInput in self.entries:
-            if(labelInput.label.cget('text') == key):
-                target = labelInput
-                break
-        if (target is not None):
+        labelInput = self.entries.pop(key, None)
+        if labelInput is not None:
             del self.data[key]
-            container = target.master
-            self.entries.remove(target)
-            container.destroy()
+            labelInput.master.pack_forget()
+            self._spare.append(labelInput)
 
     def _clear_new_entry(self):
         for entry in self.new_entry.widgets:
@@ -133,9 +367,7 @@ class DictView(tk.Frame):
         key = self.new_entry.widgets[0].get().strip().lower()
         if len(key) != 0 and key not in self.data:
             value = self.new_entry.widgets[1].get().strip()
-            self.data[key] = value
-
-            self._add_data(self, {key: value})
+            self.add_entries({key: value})
 
         self._clear_new_entry()
 
@@ -0,0 +1,91 @@
+"""Test the headless batch pricing entry point."""
+import io
+import json
+
+from ringup.cli import BatchPricer, RowError, main, read_rows
+
+import pytest
+
+CSV_FEED = """sku,name,cost,waste,type,color
+12r,dozen roses,29.99,0.05,,red
+BV,vase,10,,addon,
+RB,ribbon,2,,addon,
+T,tulips,5,,,
+"""
+
+
+def test_price_csv_feed():
+    rows = list(BatchPricer(.75).price(read_rows(io.StringIO(CSV_FEED), 'csv')))
+
+    assert [row['sku'] for row in rows] == ['12r', 'T']
+    assert rows[0]['total_cost'] == 29.99 * 1.05 + 10 + 2
+    assert rows[0]['price'] == round(rows[0]['total_cost'] / .25, 2)
+    assert rows[1]['profit'] == 15.0
+
+def test_price_raises_RowError():
+    feed = io.StringIO(CSV_FEED.replace('29.99', '-1'))
+    with pytest.raises(RowError):
+        list(BatchPricer().price(read_rows(feed, 'csv')))
+
+def test_price_skips_invalid_product_and_its_addons():
+    feed = io.StringIO(CSV_FEED.replace('29.99', '-1'))
+    pricer = BatchPricer(skip_invalid=True)
+    rows = list(pricer.price(read_rows(feed, 'csv')))
+
+    assert [row['sku'] for row in rows] == ['T']
+    assert pricer.skipped == 3
+
+def test_row_numbers_count_data_rows():
+    csv_feed = io.StringIO(CSV_FEED.replace('T,tulips,5', 'T,tulips,-5'))
+    jsonl_feed = io.StringIO('\n'.join((
+        '',
+        json.dumps({'sku': 'A', 'name': 'foo', 'cost': 3}),
+        '',
+        json.dumps({'sku': 'B', 'name': 'bar', 'cost': -1}),
+        )))
+    for feed, format_ in ((csv_feed, 'csv'), (jsonl_feed, 'jsonl')):
+        with pytest.raises(RowError) as error:
+            list(BatchPricer().price(read_rows(feed, format_)))
+        assert error.value.number == {'csv': 4, 'jsonl': 2}[format_]
+
+@pytest.mark.parametrize('margin', ['1', '1.5', '-.1'])
+def test_main_rejects_invalid_margin(margin, capsys):
+    with pytest.raises(SystemExit) as error:
+        main(['-', '-m', margin])
+    assert error.value.code == 2
+    assert '--margin' in capsys.readouterr().err
+
+@pytest.mark.parametrize('line', ['[1, 2]', '"x"', '3'])
+def test_jsonl_row_must_be_an_object(line):
+    with pytest.raises(RowError) as error:
+        list(read_rows(io.StringIO(line), 'jsonl'))
+    assert error.value.number == 1
+
+def test_main_rejects_unreadable_paths(tmp_path, capsys):
+    feed = tmp_path / 'feed.csv'
+    feed.write_text(CSV_FEED)
+    for args in (
+            [str(tmp_path / 'missing.csv')],
+            [str(feed), '-o', str(tmp_path / 'missing' / 'out.csv')],
+            ):
+        with pytest.raises(SystemExit) as error:
+            main(args)
+        assert error.value.code == 2
+        assert 'cannot' in capsys.readouterr().err
+
+def test_main_jsonl(tmp_path):
+    feed = tmp_path / 'feed.jsonl'
+    feed.write_text('\n'.join((
+        json.dumps({'sku': 'A', 'name': 'foo', 'cost': 3}),
+        json.dumps({'sku': 'B', 'name': 'bar', 'cost': 1, 'type': 'addon'}),
+        )))
+    out = tmp_path / 'out.jsonl'
+
+    assert main([str(feed), '-o', str(out), '-m', '.5']) == 0
+    assert json.loads(out.read_text()) == {
+            'sku': 'A',
+            'name': 'Foo',
+            'total_cost': 4.0,
+            'price': 8.0,
+            'profit': 4.0,
+        }
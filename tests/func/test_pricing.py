@@ -0,0 +1,107 @@
+"""Test the margin sweep engine."""
+from ringup.pricing import MarginSweep, ParallelRepricer, margin_range
+from ringup.product import ProductCatalog
+from ringup.snapshot import CatalogSnapshot, write_snapshot
+from ringup.models import Product, Addon, CostFormula, ProductRecord
+
+import pytest
+
+MARGINS = (.5, .6, .75)
+
+
+@pytest.fixture()
+def products():
+    products = [Product(i, 'P{}'.format(i), 'Foo', i * 3.15) for i in range(5)]
+    Addon(products[1], 'a1', 'AO1', 'Bar', 3.00, waste=.05)
+    return products
+
+
+def test_margin_range():
+    assert margin_range(.5, .8, .1) == [.5, .6, .7]
+
+def test_new_sweep_raises_ValueError():
+    with pytest.raises(ValueError):
+        MarginSweep([.5, 1])
+
+def test_matrix(products):
+    prices, profits = MarginSweep(MARGINS).matrix(products)
+
+    for product, price_row, profit_row in zip(products, prices, profits):
+        assert list(price_row) == [product.calculate_price(m) for m in MARGINS]
+        assert list(profit_row) == [product.calculate_profit(m) for m in MARGINS]
+
+def test_matrix_rounds_half_cents_as_products():
+    # 192.3215 / .7 sits just above a half cent, which scaling by 100 loses
+    products = [Product(1, 'P1', 'Foo', 192.3215)]
+    prices, profits = MarginSweep([.3]).matrix(products)
+
+    assert list(prices[0]) == [products[0].calculate_price(.3)] == [274.75]
+    assert list(profits[0]) == [products[0].calculate_profit(.3)]
+
+def test_stream_matches_matrix(products):
+    sweep = MarginSweep(MARGINS)
+    catalog = ProductCatalog()
+    for product in products:
+        catalog.add(product)
+
+    prices, profits = sweep.matrix(products)
+    for source in (products, catalog):
+        chunks = list(sweep.stream(source, chunk_size=2))
+        assert [len(chunk.ids) for chunk in chunks] == [2, 2, 1]
+        assert [id_ for chunk in chunks for id_ in chunk.ids] == \
+            [p.id_ for p in products]
+        assert [list(row) for chunk in chunks for row in chunk.prices] == \
+            [list(row) for row in prices]
+
+@pytest.fixture()
+def snapshot(products, tmp_path):
+    catalog = ProductCatalog()
+    for product in products:
+        catalog.add(product)
+    catalog.add(Product(9, 'F', 'Formula', CostFormula('x * 2', {'x': 4.5})))
+    path = str(tmp_path / 'catalog.snap')
+    write_snapshot(catalog, path)
+    with CatalogSnapshot(path) as snapshot:
+        yield snapshot
+
+def test_parallel_matrix_matches_sweep(snapshot):
+    prices, profits = MarginSweep(MARGINS).matrix(snapshot)
+    p_prices, p_profits = ParallelRepricer(MARGINS, 2, 2).matrix(snapshot)
+
+    assert [list(row) for row in p_prices] == [list(row) for row in prices]
+    assert [list(row) for row in p_profits] == [list(row) for row in profits]
+
+def test_parallel_stream_matches_sweep(snapshot):
+    chunks = list(ParallelRepricer(MARGINS, 2, 4).stream(snapshot))
+    serial = list(MarginSweep(MARGINS).stream(snapshot, chunk_size=4))
+
+    assert [chunk.ids for chunk in chunks] == [chunk.ids for chunk in serial]
+    for chunk, expected in zip(chunks, serial):
+        assert [list(row) for row in chunk.prices] == \
+            [list(row) for row in expected.prices]
+        assert [list(row) for row in chunk.profits] == \
+            [list(row) for row in expected.profits]
+
+def test_parallel_matrix_of_many_rows_matches_sweep(tmp_path):
+    catalog = ProductCatalog()
+    for i in range(5000):
+        catalog.add(ProductRecord(i, 'P{}'.format(i), 'Foo', i * .0137, .5))
+    path = str(tmp_path / 'catalog.snap')
+    write_snapshot(catalog, path)
+    margins = margin_range(.3, .8, .05)
+    repricer = ParallelRepricer(margins, 2, 700)
+
+    with CatalogSnapshot(path) as snapshot:
+        prices, profits = MarginSweep(margins).matrix(snapshot)
+        p_prices, p_profits = repricer.matrix(snapshot)
+    assert [list(row) for row in p_prices] == [list(row) for row in prices]
+    assert [list(row) for row in p_profits] == [list(row) for row in profits]
+
+def test_parallel_jobs_send_row_ranges(snapshot):
+    job = next(ParallelRepricer(MARGINS, 2, 1000)._jobs(snapshot))
+    # the rows' bounds rather than their products or totals
+    assert job[2:] == (0, 1000)
+
+def test_parallel_rejects_products(products):
+    with pytest.raises(TypeError):
+        ParallelRepricer(MARGINS, 2, 2).stream(products)
@@ -1,6 +1,7 @@
 """Test the product product_manager."""
-from ringup.product import ProductManager
-from ringup.models import Product, Addon
+from ringup.product import ProductManager, ProductCatalog
+from ringup.models import Product, Addon, CostFormula
+from ringup.storage import SQLiteProductStore
 
 import pytest
 
@@ -260,7 +261,107 @@ def test_remove_addon_when_product_not_created_and_addon_created(product_manager
     expected = BLANK_PRODUCT
     assert product == expected
 
+def test_catalog_prices_match_products(product_manager, product_data, addon_data):
+    catalog = ProductCatalog(product_manager)
+    products = []
+    for i in range(3):
+        product_manager.create_product(**dict(product_data, cost=i * 10.5))
+        if i:
+            product_manager.create_addon(**addon_data)
+        catalog.add_product()
+        products.append(product_manager.get_product())
+
+    assert len(catalog) == 3
+    assert list(catalog.total_costs()) == [p.total_cost for p in products]
+    assert list(catalog.calculate_price(.6)) == [p.calculate_price(.6) for p in products]
+    assert list(catalog.calculate_profit()) == [p.calculate_profit() for p in products]
+
+def test_catalog_prices_round_half_cents_as_products(product_manager, product_data):
+    # 192.3215 / .7 sits just above a half cent, which scaling by 100 loses
+    catalog = ProductCatalog(product_manager)
+    product = product_manager\
+            .create_product(**dict(product_data, cost=192.3215))\
+            .get_product()
+    catalog.add(product)
 
+    assert product.calculate_price(.3) == 274.75
+    assert list(catalog.calculate_price(.3)) == [product.calculate_price(.3)]
+    assert list(catalog.calculate_profit(.3)) == [product.calculate_profit(.3)]
+
+def test_catalog_add_replaces_existing_row(product_manager, product_data):
+    catalog = ProductCatalog(product_manager)
+    product = product_manager.create_product(**product_data).get_product()
+    row = catalog.add(product)
 
+    product.cost = 1.00
+    assert catalog.add(product) == row
+    assert len(catalog) == 1
+    assert catalog.get_record(row).cost == 1.00
 
 
+def test_save_and_open_product(product_data, addon_data):
+    store = SQLiteProductStore()
+    manager = ProductManager(store)
+    product = manager\
+            .create_product(size='48x96', **product_data)\
+            .create_addon(**addon_data)\
+            .create_addon(sku='AO2', name='Baz', cost=CostFormula('x*2', {'x': 1.5}))\
+            .save()\
+            .get_product()
+    p_id = product.product.product.id_
+
+    opened = ProductManager(store).open_product(p_id)
+    assert opened.product.sku == product_data['sku']
+    assert opened.product.addons == {}
+    assert opened.product.get_custom_attribute('size') == '48x96'
+
+    addon = opened.get_product()
+    assert [a.sku for a in addon.addons.values()] == ['AO1', 'AO2']
+    assert addon.cost == 3
+    assert opened.calculate_price() == manager.calculate_price()
+
+    by_sku = ProductManager(store).open_product_by_sku(product_data['sku'])
+    assert by_sku.get_product().id_ == product.id_
+
+def test_open_missing_product_raises_KeyError():
+    with pytest.raises(KeyError):
+        ProductManager(SQLiteProductStore()).open_product('RandomID')
+
+def test_save_after_load_keeps_addons(product_data, addon_data):
+    store = SQLiteProductStore()
+    p_id = ProductManager(store)\
+            .create_product(**product_data)\
+            .create_addon(**addon_data)\
+            .save()\
+            .product.id_
+
+    def saved_skus():
+        complete = store.load_addons(store.load(p_id))
+        return [a.sku for a in complete.addons.values()]
+
+    product = store.load(p_id)
+    product.waste = .1
+    store.save(product)
+    assert saved_skus() == ['AO1']
+    assert store.load(p_id).waste == .1
+
+    product = store.load(p_id)
+    Addon(product, 'A2', 'AO2', 'Baz', 1.0)
+    store.save(product)
+    assert saved_skus() == ['AO1', 'AO2']
+
+    product = store.load(p_id)
+    store.load_addons(product)
+    product.remove_addon('A2')
+    store.save(product)
+    assert saved_skus() == ['AO1']
+
+def test_load_custom_attribute_named_like_an_argument(product_data):
+    store = SQLiteProductStore()
+    product = Product('P1', **product_data)
+    product.set_custom_attribute('sku', 'x')
+    store.save(product)
+
+    loaded = store.load('P1')
+    assert loaded.sku == product_data['sku']
+    assert loaded.get_custom_attribute('sku') == 'x'
@@ -0,0 +1,50 @@
+"""Test memory-mapped catalog snapshots."""
+from ringup.product import ProductCatalog
+from ringup.snapshot import CatalogSnapshot, write_snapshot
+from ringup.models import Product, Addon
+
+import pickle
+import pytest
+
+
+@pytest.fixture()
+def catalog():
+    catalog = ProductCatalog()
+    for i in range(5):
+        catalog.add(Product(i, 'P{}'.format(i % 3), 'Föo', i * 3.15))
+    catalog.add(Addon(Product(9, 'Z', 'Bar', 2.0), 'a1', 'AO1', 'Baz', 3.00))
+    return catalog
+
+
+@pytest.fixture()
+def snapshot(catalog, tmp_path):
+    path = str(tmp_path / 'catalog.snap')
+    write_snapshot(catalog, path)
+    with CatalogSnapshot(path) as snapshot:
+        yield snapshot
+
+
+def test_rows_match_catalog(catalog, snapshot):
+    assert len(snapshot) == len(catalog)
+    assert snapshot.ids[:] == catalog.ids
+    assert snapshot.names[-1] == snapshot[5].name == 'Bar'
+    assert [r.total_cost for r in snapshot] == [r.total_cost for r in catalog]
+    assert list(snapshot.calculate_price()) == list(catalog.calculate_price())
+
+def test_lookup(snapshot):
+    assert snapshot.row('3') == 3
+    assert snapshot.row_by_sku('P1') == 1
+    assert snapshot.row_by_sku('Z') == 5
+    with pytest.raises(KeyError):
+        snapshot.row_by_sku('P3')
+
+def test_pickles_as_path(snapshot):
+    copy = pickle.loads(pickle.dumps(snapshot))
+    assert copy.get_record(5).price == snapshot.get_record(5).price
+    copy.close()
+
+def test_open_raises_ValueError(tmp_path):
+    path = tmp_path / 'bad.snap'
+    path.write_bytes(b'not a snapshot')
+    with pytest.raises(ValueError):
+        CatalogSnapshot(str(path))
@@ -0,0 +1,45 @@
+"""Test the opt-in pricing metrics."""
+from ringup.lib.metrics import Metrics
+from ringup.models import Product, Addon, CostFormula
+
+import pytest
+
+
+@pytest.fixture()
+def metrics():
+    metrics = Metrics()
+    yield metrics
+    metrics.disable()
+
+
+def test_counts_calls_per_class(metrics):
+    original = Product.calculate_price
+    metrics.enable()
+    p = Product(1, 'P1', 'Foo', CostFormula('x * 2', {'x': 3}))
+    a = Addon(p, 2, 'A1', 'Bar', 1.0)
+    p.calculate_price()
+    a.calculate_price()
+    a.calculate_price(.5)
+
+    stats = metrics.snapshot()
+    assert stats['Product.calculate_price']['calls'] == 1
+    assert stats['Addon.calculate_price']['calls'] == 2
+    assert stats['CostFormula.get_cost']['calls'] >= 1
+    assert stats['Addon.total_cost']['total_ms'] >= 0
+
+    metrics.disable()
+    assert Product.calculate_price is original
+    p.cost = 4
+    p.calculate_price()
+    assert metrics.snapshot()['Product.calculate_price']['calls'] == 1
+
+def test_counts_price_reads(metrics):
+    p = Product(1, 'P1', 'Foo', 3.0)
+    a = Addon(p, 2, 'A1', 'Bar', 1.0)
+    metrics.enable()
+    assert p.price == p.calculate_price()
+    a.price
+
+    stats = metrics.snapshot()
+    assert stats['Product.calculate_price']['calls'] == 2
+    assert stats['Addon.calculate_price']['calls'] == 1
@@ -1,5 +1,14 @@
 """Test the data models."""
-from ringup.models import Product, Addon, CostFormula
+import gc
+import timeit
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from ringup.models import Product, Addon, CostFormula, ProductRecord
+from ringup.lib import formula
+from ringup.lib.formula import ResultCache
+from ringup.lib.observables import ObserverMixin, batch, defer_update
 import pytest
 
 # @pytest.fixture()
@@ -196,6 +205,65 @@ class TestProduct:
         expected = TOTAL_COST / (1 - 0.75)
         assert p.price == expected
 
+    def test_price_follows_changes(self, a_product):
+        """Cached price and profit should be recomputed after a change."""
+        p = a_product
+        assert p.calculate_price(.5) == round(p.total_cost / .5, 2)
+
+        p.cost = 60
+        assert p.total_cost == 60 * 1.02 + 0.11
+        assert p.calculate_price(.5) == round(p.total_cost / .5, 2)
+        assert p.calculate_profit(.5) == round(p.calculate_price(.5) * .5, 2)
+
+    def test_price_follows_costformula_changes(self, a_product,
+                                               a_costformula):
+        p = a_product
+        p.cost = a_costformula
+        assert p.calculated_cost == 6 * 1.02
+
+        a_costformula.variables = {'a': 2, 'b': 2, 'c': 3}
+        assert p.calculated_cost == 7 * 1.02
+
+    def test_batch_coalesces_updates(self, a_product, a_costformula):
+        """Observers should be updated once, when the outermost batch exits."""
+        class Counter(ObserverMixin):
+            loads = 0
+            def load(self):
+                self.loads += 1
+
+        p = a_product
+        counter = Counter()
+        p.registerObserver(counter)
+        with batch():
+            p.cost = a_costformula
+            with batch():
+                p.waste = 0.1
+                a_costformula.variables = {'a': 2, 'b': 2, 'c': 3}
+            defer_update(counter)
+            assert counter.loads == 0
+            assert p.calculated_cost == 7 * 1.1
+        assert counter.loads == 1
+
+    def test_observers_are_weak(self, a_product):
+        """Removed and collected observers should no longer be notified."""
+        class Counter(ObserverMixin):
+            loads = 0
+            def load(self):
+                self.loads += 1
+
+        p = a_product
+        kept, dropped = Counter(), Counter()
+        for counter in (kept, dropped, kept):
+            p.registerObserver(counter)
+        p.registerObserver(Counter())
+        gc.collect()
+        assert len(p._observers) == 2
+
+        p.removeObserver(dropped)
+        p.removeObserver(dropped)
+        p.cost = 40
+        assert (kept.loads, dropped.loads) == (1, 0)
+
     def test_remove_addon(self, a_product_with_an_addon, an_addon):
         """remove_addon() should remove the addon from addons collection"""
         p = a_product_with_an_addon
@@ -304,6 +372,63 @@ class TestAddon(TestProduct):
         assert a == p
 
 
+    def test_price_follows_product_changes(self, a_product):
+        """An addon's cached costs should follow changes down its chain."""
+        a = Addon(a_product, 325, "BV2", "Bevel Finish", 3.49)
+        price = a.price
+
+        a_product.cost = 60
+        assert a.calculated_cost == 3.49 + 60 * 1.02
+        assert a.price != price
+        assert a_product.total_cost == a.total_cost
+
+    def test_long_addon_chain(self, a_product):
+        """Costs of a long chain should track registration and changes."""
+        addons = [a_product]
+        for i in range(2000):
+            addons.append(Addon(addons[-1], i, "A{}".format(i), "Addon", 1))
+        head = addons[-1]
+        assert head.calculated_cost == a_product.calculated_cost + 2000
+        assert a_product.total_cost == head.total_cost
+
+        addons[1000].cost = 2
+        assert head.calculated_cost == a_product.calculated_cost + 2001
+        assert addons[999].calculated_cost == a_product.calculated_cost + 999
+
+        a_product.remove_addon(addons[1000].id_)
+        assert head.calculated_cost == a_product.calculated_cost + 1999
+
+    def test_sibling_addons_build_on_their_product(self, a_product):
+        """An addon's cost should follow its product link, not its siblings."""
+        first = Addon(a_product, 1, "S1", "Sibling", 1)
+        second = Addon(a_product, 2, "S2", "Sibling", 2)
+        assert first.calculated_cost == 1 + a_product.calculated_cost
+        assert second.calculated_cost == 2 + a_product.calculated_cost
+
+        first.cost = 5
+        assert second.calculated_cost == 2 + a_product.calculated_cost
+
+    def test_addon_change_reads_only_its_cost(self, a_product):
+        """Changing one addon should not evaluate the other addons' costs."""
+        reads = list()
+
+        class CountedFormula(CostFormula):
+            def get_cost(self):
+                reads.append(self)
+                return super().get_cost()
+
+        costs = [CountedFormula("x", {'x': 1}) for i in range(100)]
+        addons = [a_product]
+        for i, cost in enumerate(costs):
+            addons.append(Addon(addons[-1], i, "A{}".format(i), "Addon", cost))
+        head = addons[-1]
+
+        del reads[:]
+        costs[50].variables = {'x': 3}
+        assert reads == [costs[50]]
+        assert head.calculated_cost == a_product.calculated_cost + 102
+        assert addons[50].calculated_cost == a_product.calculated_cost + 50
+
     def test_new_addon_raises_TypeError(self, a_product,
                                         invalid_type_product_data):
         """Addon() should raise an exception with invalid param."""
@@ -317,6 +442,28 @@ class TestAddon(TestProduct):
             Addon(a_product, **invalid_value_product_data)
 
 
+class TestProductRecord:
+
+    def test_from_product(self, an_addon):
+        """A record should price the same as the product it was made from."""
+        p = an_addon.product
+        for product in (p, an_addon):
+            r = ProductRecord.from_product(product)
+            assert (r.id_, r.sku, r.name) == (p.id_, p.sku, p.name)
+            assert r.total_cost == p.total_cost
+            assert r.calculate_price(.6) == p.calculate_price(.6)
+            assert r.calculate_profit() == p.calculate_profit()
+            assert r.price == p.price
+
+    def test_has_no_instance_dict(self):
+        r = ProductRecord(1, "3-16G", "Glass", 30, 0.11, 0.02)
+        assert not hasattr(r, '__dict__')
+        assert r._custom_attributes is None
+
+        r.set_custom_attribute('size', '48x96')
+        assert r.get_custom_attribute('size') == '48x96'
+
+
 class TestCostFormula:
 
     def test_member_access(self, a_costformula):
@@ -345,6 +492,107 @@ class TestCostFormula:
     def test_get_cost(self, a_costformula):
         assert a_costformula.get_cost() == 6
 
+    def test_get_cost_reevaluates_compiled_formula(self, a_costformula):
+        """get_cost() should use current variables without reparsing."""
+        cf = a_costformula
+        compiled = cf._compiled
+        cf.variables['c'] = 10
+
+        assert cf.get_cost() == 13
+        assert cf._compiled is compiled
+
+    def test_get_cost_with_prefixed_names(self):
+        """Variables sharing a prefix should resolve independently."""
+        cf = CostFormula("stems*stem+st", {'st': 0.1, 'stem': 2, 'stems': 12})
+        assert cf.get_cost() == 12 * 2 + 0.1
+
+    def test_get_cost_keeps_float_precision(self):
+        price = 1 / 3
+        cf = CostFormula("price*3", {'price': price})
+        assert cf.get_cost() == price * 3
+
+    def test_get_costs(self, a_costformula):
+        """get_costs() should evaluate every row of the given columns."""
+        costs = a_costformula.get_costs({
+                'a': array('d', [1, 2, 3]),
+                'c': [0, 10, 20],
+            })
+        assert list(costs) == [3, 14, 25]
+
+    def test_get_costs_raises_ValueError(self):
+        cf = CostFormula("x/y", {'x': 1, 'y': 1})
+        with pytest.raises(ValueError):
+            cf.get_costs({'y': [1, 0]})
+
+    def test_get_cost_with_result_cache(self):
+        """Formulas with the same tree and inputs should share results."""
+        cache = ResultCache(maxsize=2)
+        stems = CostFormula("stems * price", {'stems': 12, 'price': 1.5}, cache)
+        dozen = CostFormula("stems*price", {'stems': 12, 'price': 1.5}, cache)
+
+        assert stems.get_cost() == dozen.get_cost() == 18
+        assert cache.cache_info() == (1, 1, 2, 1)
+
+        for price in (2, 3, 4):
+            dozen.variables['price'] = price
+            dozen.get_cost()
+        assert len(cache) == 2
+
+        dozen.variables['price'] = 1.5
+        assert dozen.get_cost() == 18
+        assert cache.misses == 5
+
+    def test_shipped_parse_tables_are_current(self):
+        """The parse tables should match the grammar, as they are not
+        rewritten at runtime."""
+        from ply import yacc
+        from ringup.lib import formula_parsetab
+
+        grammar = yacc.ParserReflect(vars(formula))
+        grammar.get_all()
+        assert grammar.signature() == formula_parsetab._lr_signature
+
+    def test_compiled_formulas_are_bounded(self):
+        """Only the most recently used formula texts should stay compiled."""
+        first = formula.compile("x*1")
+        for i in range(formula.COMPILE_CACHE_SIZE):
+            formula.compile("x*{0}".format(i + 2))
+        info = formula.compile.cache_info()
+        assert info.currsize <= formula.COMPILE_CACHE_SIZE
+        assert formula.compile("x*1") is not first
+
+    def test_result_cache_hit_is_cheaper_than_evaluation(self):
+        """A hit should not walk the syntax tree or evaluate it."""
+        text = "a*b + c*d - e/f + g*h + i + sin(a*b)*c + d/e*(f - g)*(h + i)"
+        compiled = formula.compile(text)
+        names = sorted(compiled.names)
+        scope = {name: i + 1.5 for i, name in enumerate(names)}
+        cache = ResultCache()
+        cache.evaluate(compiled, scope)
+
+        def fastest(function):
+            return min(timeit.repeat(function, number=2000, repeat=5))
+
+        evaluation = fastest(lambda: compiled.evaluate(scope))
+        hit = fastest(lambda: cache.evaluate(compiled, scope))
+        assert cache.misses == 1
+        assert hit < evaluation
+
+    def test_result_cache_skips_unhashable_inputs(self):
+        cache = ResultCache()
+        compiled = formula.compile("x * 2")
+        assert cache.evaluate(compiled, {'x': [1]}) == [1, 1]
+        assert len(cache) == 0
+
+    def test_get_cost_from_many_threads(self):
+        """Concurrent formulas should not see each other's results."""
+        def cost(i):
+            return CostFormula("x*{0}+{0}".format(i), {'x': i}).get_cost()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            costs = list(pool.map(cost, list(range(200)) * 5))
+        assert costs == [i * i + i for i in range(200)] * 5
+
     def test_new_costformula_raises_TypeError(self,
                                               invalid_type_costformula_data):
         """CostFormula() should raise an exceptionwith invalid param."""
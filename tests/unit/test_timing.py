@@ -0,0 +1,24 @@
+"""Test the timing helpers."""
+from ringup.lib.timing import Timeline, profile_target
+
+
+def test_phases_nest_in_start_order():
+    timeline = Timeline('test')
+    with timeline.phase('outer'):
+        with timeline.phase('inner'):
+            pass
+    timeline.mark('done')
+
+    phases = timeline.as_dict()['phases']
+    assert [(p['name'], p['depth']) for p in phases] == \
+        [('outer', 0), ('inner', 1), ('done', 0)]
+    assert phases[0]['duration_ms'] >= phases[1]['duration_ms']
+    assert phases[2]['duration_ms'] == 0
+
+def test_profile_target():
+    env = {'RINGUP_PROFILE_STARTUP': 'env.json'}
+    assert profile_target(['ring-up.py'], {}) is None
+    assert profile_target(['ring-up.py'], env) == 'env.json'
+    assert profile_target(['ring-up.py', '--profile-startup'], env) == '-'
+    assert profile_target(
+            ['ring-up.py', '--profile-startup=out.json'], {}) == 'out.json'